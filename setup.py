@@ -65,6 +65,7 @@ setup(name='zope.app.component',
           'zope.app.container',
           'zope.app.pagetemplate',
           'zope.component [hook,zcml] >= 3.8',
+          'zope.deferredimport',
           'zope.deprecation',
           'zope.exceptions',
           'zope.formlib',
@@ -15,22 +15,108 @@
 """
 __docformat__ = "reStructuredText"
 
+import warnings
+
 import zope.component
-import zope.deprecation
+from zope.component.interfaces import ComponentLookupError
 
-from zope.site import getNextUtility, queryNextUtility # BBB
+from zope.app.component.cache import generation, getCache
 
 _marker = object()
+_notfound = object()
 
-# BBB: Deprecated on 9/26/2006
-@zope.deprecation.deprecate('''This function has been deprecated and will go
+_nextSiteManagerDeprecation = ('''This function has been deprecated and will go
 away in Zope 3.6. There is no replacement for this function, since it does not
 make sense in light of registry bases anymore. If you are using this function
 to lookup the next utility, consider using get/queryNextUtility. Otherwise, it
 is suggested to iterate through the list of bases of a registry manually.''')
+
+def queryNextUtility(context, interface, name='', default=None):
+    """Query for the next available utility.
+
+    This is `zope.component.queryNextUtility`, but the results are
+    remembered by the site manager of `context` until a registry in its
+    base chain changes:
+
+      >>> from zope.interface import Interface
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> from zope.component.registry import Components
+      >>> base = Components('base')
+      >>> sm = Components('sm', (base, ))
+      >>> class Context(object):
+      ...     def __conform__(self, iface):
+      ...         return sm
+      >>> context = Context()
+
+      >>> queryNextUtility(context, IObject, default='none')
+      'none'
+      >>> base.registerUtility('next', IObject)
+      >>> queryNextUtility(context, IObject)
+      'next'
+      >>> queryNextUtility(context, IObject)
+      'next'
+      >>> from zope.app.component.cache import cacheStatistics
+      >>> stats = cacheStatistics(sm)['queryNextUtility']
+      >>> stats['hits'], stats['misses']
+      (1, 2)
+
+    Like there, it is an error if `context` has no site manager:
+
+      >>> queryNextUtility(object(), IObject)
+      ... # doctest: +IGNORE_EXCEPTION_DETAIL
+      Traceback (most recent call last):
+      ...
+      ComponentLookupError: Could not adapt
+
+    """
+    sm = zope.component.getSiteManager(context)
+    utilities = getattr(sm, 'utilities', None)
+    if utilities is None:
+        # Not a real site manager, e.g. a testing stub
+        return zope.component.queryNextUtility(
+            context, interface, name, default)
+
+    cache = getCache(sm, 'queryNextUtility', generation(utilities))
+    key = interface, name
+    util = cache.get(key, _marker)
+    if util is _marker:
+        util = _notfound
+        for base in sm.__bases__:
+            util = base.queryUtility(interface, name, _notfound)
+            if util is not _notfound:
+                break
+        cache[key] = util
+    if util is _notfound:
+        return default
+    return util
+
+def getNextUtility(context, interface, name=''):
+    """Get the next available utility.
+
+    If no utility was found, a `ComponentLookupError` is raised.
+    """
+    util = queryNextUtility(context, interface, name, _marker)
+    if util is _marker:
+        raise ComponentLookupError(
+              "No more utilities for %s, '%s' have been found." % (
+                  interface, name))
+    return util
+
+def _warnNextSiteManager():
+    # zope.deprecation is imported when a deprecated function is called
+    # only, to keep importing this package cheap
+    import zope.deprecation
+    if zope.deprecation.__show__():
+        warnings.warn(_nextSiteManagerDeprecation, DeprecationWarning, 3)
+
+
+# BBB: Deprecated on 9/26/2006
 def getNextSiteManager(context):
     """Get the next site manager."""
-    sm = queryNextSiteManager(context, _marker)
+    _warnNextSiteManager()
+    sm = _queryNextSiteManager(context, _marker)
     if sm is _marker:
         raise zope.component.interfaces.ComponentLookupError(
               "No more site managers have been found.")
@@ -38,17 +124,17 @@ def getNextSiteManager(context):
 
 
 # BBB: Deprecated on 9/26/2006
-@zope.deprecation.deprecate('''This function has been deprecated and will go
-away in Zope 3.6. There is no replacement for this function, since it does not
-make sense in light of registry bases anymore. If you are using this function
-to lookup the next utility, consider using get/queryNextUtility. Otherwise, it
-is suggested to iterate through the list of bases of a registry manually.''')
 def queryNextSiteManager(context, default=None):
     """Get the next site manager.
 
     If the site manager of the given context is the global site manager, then
     `default` is returned.
     """
+    _warnNextSiteManager()
+    return _queryNextSiteManager(context, default)
+
+
+def _queryNextSiteManager(context, default=None):
     sm = zope.component.getSiteManager(context)
     if sm is zope.component.getGlobalSiteManager():
         return default
@@ -0,0 +1,699 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Benchmarks for local component support
+
+Run them with::
+
+  python -m zope.app.component.benchmark --depth 5 --utilities 100
+
+The site benchmarks need the ``test`` extra.  They build a chain of nested
+sites with the given number of utilities and adapters in each of them and
+time the operations of this package on the innermost site.  The results
+are written as JSON, to standard output or to the file given with
+``--output``; all times are the best of ``--repeat`` runs, in seconds.
+
+The registration views are timed without their page templates, which need
+the full ZCML configuration: a run updates the view and renders all the
+registration display adapters, which is what the templates do.
+"""
+__docformat__ = 'restructuredtext'
+
+import itertools
+import optparse
+import platform
+import sys
+import timeit
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import zope.component
+import zope.component.testing
+import zope.interface
+from zope.component.interfaces import IAdapterRegistration
+from zope.component.registry import Components
+from zope.publisher.browser import TestRequest
+from zope.publisher.interfaces.browser import IDefaultBrowserLayer
+from zope.traversing.browser.absoluteurl import SiteAbsoluteURL
+from zope.traversing.browser.interfaces import IAbsoluteURL
+from zope.traversing.interfaces import IContainmentRoot
+
+from zope.app.component.browser import registration
+
+
+class IBenchmarkUtility(zope.interface.Interface):
+    pass
+
+
+class BenchmarkUtility(object):
+    zope.interface.implements(IBenchmarkUtility)
+
+
+class IBenchmarkAdapter(zope.interface.Interface):
+    pass
+
+
+class BenchmarkAdapter(object):
+    zope.component.adapts(IBenchmarkUtility)
+    zope.interface.implements(IBenchmarkAdapter)
+
+    def __init__(self, context):
+        self.context = context
+
+
+class AdapterRegistrationDisplay(object):
+    """Minimal display of adapter registrations for the view benchmarks
+
+    The package only has display adapters for utility registrations.
+    """
+    zope.component.adapts(IAdapterRegistration, IDefaultBrowserLayer)
+    zope.interface.implements(registration.ISiteRegistrationDisplay)
+
+    def __init__(self, context, request):
+        self.context = context
+        self.request = request
+
+    def id(self):
+        return 'A%d' % id(self.context)
+
+    def render(self):
+        return {"info": self.context.name, "comment": self.context.info}
+
+    def unregister(self):
+        self.context.registry.unregisterAdapter(
+            self.context.factory, self.context.required,
+            self.context.provided, self.context.name)
+
+
+def best(func, repeat=3, setup=None):
+    """Return the best wall time of `repeat` calls of `func`, in seconds.
+
+    `setup` is called before every call of `func` and is not timed.
+    """
+    times = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = timeit.default_timer()
+        func()
+        times.append(timeit.default_timer() - start)
+    return min(times)
+
+
+def utilityRegistry(utilities):
+    sm = Components('benchmark')
+    for i in range(utilities):
+        sm.registerUtility(BenchmarkUtility(), IBenchmarkUtility, u'u%d' % i)
+    return sm
+
+
+def benchmarkIdResolution(registrations=10000, selected=2, repeat=3):
+    """Find the registrations submitted to the unregister form.
+
+    `old` builds a display adapter for every registration and maps them by
+    id, `new` decodes the submitted ids.
+    """
+    zope.component.testing.setUp()
+    try:
+        zope.component.provideAdapter(
+            registration.UtilitySiteRegistrationDisplay)
+        sm = utilityRegistry(registrations)
+        request = TestRequest()
+        display = registration.ISiteRegistrationDisplay
+        ids = [registration._utilityId(
+                   registration._dottedName(IBenchmarkUtility), u'u%d' % i)
+               for i in range(selected)]
+
+        def old():
+            displays = dict([
+                (d.id(), d) for d in [
+                    zope.component.getMultiAdapter((r, request), display)
+                    for r in sm.registeredUtilities()]])
+            return [displays[id] for id in ids]
+
+        def new():
+            found = []
+            for id in ids:
+                kind, provided, name = registration._parseId(id)
+                found.append(registration._findUtilityRegistration(
+                    sm, provided, name))
+            return found
+
+        return {'benchmark': 'id-resolution',
+                'registrations': registrations,
+                'old': best(old, repeat),
+                'new': best(new, repeat)}
+    finally:
+        zope.component.testing.tearDown()
+
+
+def benchmarkSorting(registrations=10000, repeat=3):
+    """Sort the registrations shown by the site registration view.
+
+    `old` sorts the registration objects, which compares their
+    representations, `build` builds the registration index with the sort
+    keys and `new` gets the sorted registrations from an existing index.
+    """
+    from zope.app.component.index import RegistrationIndex
+    from zope.app.component.index import getRegistrationIndex
+
+    zope.component.testing.setUp()
+    try:
+        sm = utilityRegistry(registrations)
+        getRegistrationIndex(sm).sorted()
+        return {'benchmark': 'sorting',
+                'registrations': registrations,
+                'old': best(lambda: sorted(sm.registeredUtilities()),
+                            repeat),
+                'build': best(lambda: RegistrationIndex(sm).sorted(),
+                              repeat),
+                'new': best(lambda: getRegistrationIndex(sm).sorted(),
+                            repeat)}
+    finally:
+        zope.component.testing.tearDown()
+
+
+def buildSites(root, depth, utilities=0, adapters=0):
+    """Turn `root` and a chain of `depth` - 1 folders below it into sites.
+
+    Every site gets `utilities` utilities, which are stored in its default
+    site management folder, and `adapters` adapter registrations.  The root
+    site has an additional utility named ``top``.  The sites are returned,
+    outermost first.
+    """
+    from zope.app.testing import setup
+    from zope.site.folder import Folder
+
+    sites = []
+    folder = root
+    for level in range(depth):
+        if level:
+            name = u'site%d' % level
+            folder[name] = Folder()
+            folder = folder[name]
+        sm = setup.createSiteManager(folder)
+        for i in range(utilities):
+            setup.addUtility(sm, u'u%d' % i, IBenchmarkUtility,
+                             BenchmarkUtility())
+        for i in range(adapters):
+            sm.registerAdapter(BenchmarkAdapter, name=u'a%d' % i)
+        sites.append(folder)
+    setup.addUtility(sites[0].getSiteManager(), u'top', IBenchmarkUtility,
+                     BenchmarkUtility())
+    return sites
+
+
+def _setUpViews():
+    zope.component.provideAdapter(
+        SiteAbsoluteURL, (IContainmentRoot, IDefaultBrowserLayer),
+        zope.interface.Interface, name='absolute_url')
+    zope.component.provideAdapter(
+        SiteAbsoluteURL, (IContainmentRoot, IDefaultBrowserLayer),
+        IAbsoluteURL)
+    zope.component.provideAdapter(registration.UtilityRegistrationDisplay)
+    zope.component.provideAdapter(
+        registration.UtilitySiteRegistrationDisplay)
+    zope.component.provideAdapter(AdapterRegistrationDisplay)
+
+
+def _render(view):
+    view.update()
+    return [(display.id(), display.render())
+            for display in view.registrations()]
+
+
+def benchmarkSites(depth=5, utilities=100, adapters=10, repeat=3,
+                   calls=1000, sites=100):
+    """Time the site operations on the innermost of `depth` nested sites.
+
+    `calls` is the number of lookups and registrations made in a run,
+    `sites` the number of folders converted to sites in a run.  These are
+    added `depth` folders below the innermost site, in folders that aren't
+    sites.
+    """
+    from zope.app.component import queryNextUtility
+    from zope.app.component.browser import MakeSite
+    from zope.app.component.bulk import makeSites
+    from zope.app.component.testing import PlacefulSetup
+    from zope.site.folder import Folder
+
+    placeful = PlacefulSetup()
+    placeful.setUp()
+    try:
+        _setUpViews()
+        placeful.createRootFolder()
+        site = buildSites(placeful.rootFolder, depth, utilities,
+                          adapters)[-1]
+        sm = site.getSiteManager()
+        utility = sm['default'][u'u0']
+        request = TestRequest()
+        counter = itertools.count()
+        results = {}
+
+        results['_registrations'] = best(
+            lambda: list(registration._registrations(sm, None)), repeat)
+        results['_sorted'] = best(
+            lambda: registration._sorted(sm, None), repeat)
+        results['_registrations(component)'] = best(
+            lambda: list(registration._registrations(utility, utility)),
+            repeat)
+        results['RegistrationView'] = best(
+            lambda: _render(registration.RegistrationView(utility, request)),
+            repeat)
+        results['SiteRegistrationView'] = best(
+            lambda: _render(registration.SiteRegistrationView(sm, request)),
+            repeat)
+
+        def register():
+            for i in range(calls):
+                view = registration.AddUtilityRegistration(utility, request)
+                view.register.success({'provided': IBenchmarkUtility,
+                                       'name': u'r%d' % next(counter),
+                                       'comment': u''})
+        results['AddUtilityRegistration.register'] = best(register, repeat)
+
+        container = site
+        for i in range(depth):
+            container[u'plain'] = Folder()
+            container = container[u'plain']
+        folders = []
+        def addFolders():
+            del folders[:]
+            for i in range(sites):
+                name = u'new%d' % next(counter)
+                container[name] = Folder()
+                folders.append(container[name])
+        def addSiteManagers():
+            for folder in folders:
+                MakeSite(folder, request).addSiteManager()
+        results['MakeSite.addSiteManager'] = best(
+            addSiteManagers, repeat, addFolders)
+        results['makeSites'] = best(
+            lambda: makeSites(folders), repeat, addFolders)
+
+        def lookup():
+            for i in range(calls):
+                queryNextUtility(site, IBenchmarkUtility, u'top')
+        results['queryNextUtility'] = best(lookup, repeat)
+
+        return {'benchmark': 'sites',
+                'depth': depth,
+                'utilities': utilities,
+                'adapters': adapters,
+                'calls': calls,
+                'sites': sites,
+                'results': results}
+    finally:
+        placeful.tearDown()
+
+
+class _BenchmarkSite(object):
+
+    def __init__(self, sm):
+        self.sm = sm
+
+    def getSiteManager(self):
+        return self.sm
+
+
+def benchmarkSiteStorage(calls=100000, repeat=3):
+    """Time the site hooks with the thread local and the context variable.
+
+    The times are per call, in seconds.  ``None`` is returned if context
+    variables are not available.
+    """
+    from zope.component.hooks import setHooks, setSite
+    from zope.app.component import contextsite
+
+    if not contextsite.CONTEXTVARS_SUPPORT:
+        return None
+
+    zope.component.testing.setUp()
+    try:
+        sm = utilityRegistry(0)
+        sm.registerAdapter(BenchmarkAdapter)
+        site = _BenchmarkSite(sm)
+        utility = BenchmarkUtility()
+        getSiteManager = zope.component.getSiteManager
+        adapter_hook = zope.component.adapter_hook
+        loop = range(calls)
+
+        def run():
+            results = {}
+            setSite(site)
+            def setSites():
+                for i in loop:
+                    setSite(site)
+            results['setSite'] = best(setSites, repeat) / calls
+            def getSiteManagers():
+                for i in loop:
+                    getSiteManager()
+            results['getSiteManager'] = best(getSiteManagers, repeat) / calls
+            def adapt():
+                for i in loop:
+                    adapter_hook(IBenchmarkAdapter, utility)
+            results['adapter_hook'] = best(adapt, repeat) / calls
+            setSite()
+            return results
+
+        setHooks()
+        local = run()
+        contextsite.install()
+        try:
+            context = run()
+        finally:
+            contextsite.uninstall()
+        return {'benchmark': 'site-storage',
+                'calls': calls,
+                'threading.local': local,
+                'contextvars': context}
+    finally:
+        zope.component.testing.tearDown()
+
+
+def benchmarkTraversal(depth=5, requests=10000, repeat=3):
+    """Time the site subscribers of zope.site and this package.
+
+    A request traverses the root site twice, as a virtual host request
+    does, and a chain of `depth` - 1 further sites, with a lookup in every
+    site.  The times are per request, in seconds.
+    """
+    from zope.component.hooks import setHooks, clearSite
+    import zope.site
+    from zope.app.component import site
+
+    zope.component.testing.setUp()
+    try:
+        setHooks()
+        path = []
+        for i in range(depth):
+            sm = utilityRegistry(0)
+            sm.registerAdapter(BenchmarkAdapter)
+            path.append(_BenchmarkSite(sm))
+        path.insert(0, path[0])
+        utility = BenchmarkUtility()
+        adapter_hook = zope.component.adapter_hook
+
+        def traverse(subscriber):
+            def run():
+                for i in range(requests):
+                    for ob in path:
+                        subscriber(ob, None)
+                        adapter_hook(IBenchmarkAdapter, utility)
+                    clearSite()
+            return best(run, repeat) / requests
+
+        return {'benchmark': 'traversal',
+                'depth': depth,
+                'requests': requests,
+                'old': traverse(zope.site.threadSiteSubscriber),
+                'new': traverse(site.threadSiteSubscriber)}
+    finally:
+        zope.component.testing.tearDown()
+
+
+def _siteTree(folder, depth, width):
+    from zope.app.testing import setup
+    from zope.site.folder import Folder
+
+    setup.createSiteManager(folder)
+    if depth > 1:
+        for i in range(width):
+            folder[u'site%d' % i] = Folder()
+            _siteTree(folder[u'site%d' % i], depth - 1, width)
+
+
+def benchmarkMove(depth=3, width=5, repeat=3):
+    """Move a folder with nested sites between two sites.
+
+    The folder contains `width` sites, each of them `width` sites and so
+    on, `depth` levels deep.  `old` updates the sites with the subscriber
+    of zope.site, `new` with the one of this package.  `changed` is the
+    number of adapter registries a move changed with each of them.
+    """
+    from zope.app.component import site as sitemodule
+    from zope.app.component.testing import PlacefulSetup
+    from zope.app.component.warmup import sites as findSites
+    from zope.app.testing import setup
+    from zope.lifecycleevent import ObjectMovedEvent
+    from zope.site.folder import Folder
+    import zope.site.site
+
+    placeful = PlacefulSetup()
+    placeful.setUp()
+    try:
+        placeful.createRootFolder()
+        root = placeful.rootFolder
+        setup.createSiteManager(root)
+        for name in (u'a', u'b'):
+            root[name] = Folder()
+            setup.createSiteManager(root[name])
+        root[u'a'][u'moved'] = moved = Folder()
+        _siteTree(moved, depth, width)
+        sites = list(findSites(moved))
+        registries = [s.getSiteManager().adapters for s in sites]
+        parents = [root[u'a'], root[u'b']]
+        counts = {}
+
+        def move(name, subscriber):
+            old, new = parents
+            del old[u'moved']
+            new[u'moved'] = moved
+            parents.reverse()
+            event = ObjectMovedEvent(moved, old, u'moved', new, u'moved')
+            generations = [r._generation for r in registries]
+            for site in sites:
+                subscriber(site, event)
+            counts[name] = len([r for r, g in zip(registries, generations)
+                                if r._generation != g])
+
+        results = {}
+        for name, subscriber in (
+            ('old', zope.site.site.changeSiteConfigurationAfterMove),
+            ('new', sitemodule.changeSiteConfigurationAfterMove)):
+            results[name] = best(lambda: move(name, subscriber), repeat)
+        return {'benchmark': 'move',
+                'depth': depth,
+                'width': width,
+                'sites': len(sites),
+                'changed': counts,
+                'old': results['old'],
+                'new': results['new']}
+    finally:
+        placeful.tearDown()
+
+
+def benchmarkPlacefulSetUp(tests=100, repeat=3):
+    """Time setting up and tearing down placeful tests with a site.
+
+    `built` builds the sample folder tree and site manager for every test,
+    `snapshot` copies them from a snapshot.  The times are per test, in
+    seconds.
+    """
+    from zope.app.component import testing
+
+    class Test(testing.PlacefulSetup):
+        pass
+
+    def measure(snapshots):
+        Test.snapshots = snapshots
+        def run():
+            for i in range(tests):
+                test = Test()
+                test.setUp(site=True)
+                test.tearDown()
+        return best(run, repeat) / tests
+
+    testing.clearSnapshots()
+    return {'benchmark': 'placeful-setup',
+            'tests': tests,
+            'built': measure(False),
+            'snapshot': measure(True)}
+
+
+# The modules whose BBB names are imported lazily
+_BBB_MODULES = ('zope.app.component.hooks',
+                'zope.app.component.site',
+                'zope.app.component.vocabulary',
+                'zope.app.component.metaconfigure',
+                'zope.app.component.metadirectives',
+                'zope.app.component.contentdirective',
+                'zope.app.component.interfaces',
+                'zope.app.component.browser')
+
+_EAGER = """
+import sys
+import %s
+module = sys.modules[%r]
+for name in list(getattr(module, '__deferred_definitions__', ())):
+    getattr(module, name)
+"""
+
+
+def _importTime(code):
+    # The seconds spent importing and the number of modules imported by
+    # running `code` in a new interpreter, from ``-X importtime``
+    import subprocess
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c',
+                                code],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    out, err = process.communicate()
+    if process.returncode:
+        raise RuntimeError(err)
+    total = modules = 0
+    for line in err.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            total += int(fields[0])
+        except ValueError:
+            # The header
+            continue
+        modules += 1
+    return total / 1e6, modules
+
+
+_TIMED = """
+import sys, timeit
+before = set(sys.modules)
+start = timeit.default_timer()
+%s
+seconds = timeit.default_timer() - start
+sys.stdout.write('%%r %%d' %% (seconds, len([
+    name for name, module in sys.modules.items()
+    if module is not None and name not in before])))
+"""
+
+
+def _timedImport(code):
+    # Like `_importTime`, for interpreters without ``-X importtime``: the
+    # code is timed as a whole and the new entries of `sys.modules` are
+    # counted, leaving out the ``None`` entries of failed relative imports
+    import subprocess
+    process = subprocess.Popen([sys.executable, '-c', _TIMED % code],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    out, err = process.communicate()
+    if process.returncode:
+        raise RuntimeError(err)
+    seconds, modules = out.split()
+    return float(seconds), int(modules)
+
+
+def benchmarkImportTime(modules=_BBB_MODULES, repeat=3):
+    """Time importing the BBB modules, with their names resolved or not.
+
+    Every module is imported in a new interpreter.  `lazy` only imports the
+    module, like a worker that needs a single name from it does; `eager`
+    also resolves all the names it re-exports, which is what importing it
+    did before.  With ``-X importtime`` (Python 3.7 and later), the times
+    are the sum of the import times of all modules imported; otherwise the
+    import is timed as a whole.  The times are in seconds, and `modules`
+    is the number of modules imported.
+    """
+    if sys.version_info < (3, 7):
+        run = _timedImport
+    else:
+        run = _importTime
+
+    def measure(code):
+        seconds, count = min([run(code) for i in range(repeat)])
+        return {'seconds': seconds, 'modules': count}
+
+    results = {}
+    for module in modules:
+        results[module] = {
+            'lazy': measure('import %s' % module),
+            'eager': measure(_EAGER % (module, module)),
+            }
+    return {'benchmark': 'import-time',
+            'modules': results}
+
+
+def _version():
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution('zope.app.component').version
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option('--depth', type='int', default=5,
+                      help="number of nested sites")
+    parser.add_option('--utilities', type='int', default=100,
+                      help="number of utilities in every site")
+    parser.add_option('--adapters', type='int', default=10,
+                      help="number of adapters in every site")
+    parser.add_option('--calls', type='int', default=1000,
+                      help="number of lookups and registrations in a run")
+    parser.add_option('--sites', type='int', default=100,
+                      help="number of folders made sites in a run")
+    parser.add_option('--registrations', type='int', default=10000,
+                      help="number of registrations for the id resolution "
+                           "and sorting benchmarks")
+    parser.add_option('--hook-calls', type='int', default=100000,
+                      help="number of calls of the site hooks in a run")
+    parser.add_option('--requests', type='int', default=10000,
+                      help="number of traversals in a run")
+    parser.add_option('--move-depth', type='int', default=3,
+                      help="levels of nested sites in the moved folder")
+    parser.add_option('--move-width', type='int', default=5,
+                      help="number of sites in every site of the moved "
+                           "folder")
+    parser.add_option('--tests', type='int', default=100,
+                      help="number of placeful tests set up in a run")
+    parser.add_option('--repeat', type='int', default=3,
+                      help="number of runs, the best one is reported")
+    parser.add_option('--output', default=None,
+                      help="file to write the results to")
+    options, args = parser.parse_args(argv)
+
+    benchmarks = [
+        benchmarkIdResolution(options.registrations,
+                              repeat=options.repeat),
+        benchmarkSorting(options.registrations, options.repeat),
+        benchmarkSites(options.depth, options.utilities, options.adapters,
+                       options.repeat, options.calls, options.sites),
+        ]
+    benchmarks.append(benchmarkTraversal(options.depth, options.requests,
+                                         options.repeat))
+    benchmarks.append(benchmarkMove(options.move_depth, options.move_width,
+                                    options.repeat))
+    storage = benchmarkSiteStorage(options.hook_calls, options.repeat)
+    if storage is not None:
+        benchmarks.append(storage)
+    benchmarks.append(benchmarkPlacefulSetUp(options.tests, options.repeat))
+    benchmarks.append(benchmarkImportTime(repeat=options.repeat))
+    result = json.dumps({'version': _version(),
+                         'python': platform.python_version(),
+                         'repeat': options.repeat,
+                         'benchmarks': benchmarks},
+                        indent=2, sort_keys=True)
+    if options.output:
+        f = open(options.output, 'w')
+        try:
+            f.write(result + '\n')
+        finally:
+            f.close()
+    else:
+        sys.stdout.write(result + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,93 +15,26 @@
 """
 __docformat__ = 'restructuredtext'
 
+import timeit
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 import zope.component
 import zope.component.interfaces
+import zope.deferredimport
 from zope.exceptions.interfaces import UserError
 from zope.security.proxy import removeSecurityProxy
 from zope.publisher.browser import BrowserView
-from zope.component.interfaces import IFactory
-from zope.component.interface import searchInterface
 
 from zope.app.component.i18n import ZopeMessageFactory as _
-from zope.app.container.browser.adding import Adding
-from zope.app.component.site import LocalSiteManager
-
-class ComponentAdding(Adding):
-    """Adding subclass used for registerable components."""
-
-    menu_id = "add_component"
-
-    def add(self, content):
-        # Override so as to save a reference to the added object
-        self.added_object = super(ComponentAdding, self).add(content)
-        return self.added_object
-
-    def nextURL(self):
-        v = zope.component.queryMultiAdapter(
-            (self.added_object, self.request), name="registration.html")
-        if v is not None:
-            url = str(zope.component.getMultiAdapter(
-                (self.added_object, self.request), name='absolute_url'))
-            return url + "/@@registration.html"
-
-        return super(ComponentAdding, self).nextURL()
-
-    def action(self, type_name, id=''):
-        # For special case of that we want to redirect to another adding view
-        # (usually another menu such as AddUtility)
-        if type_name.startswith("../"):
-            # Special case
-            url = type_name
-            if id:
-                url += "?id=" + id
-            self.request.response.redirect(url)
-            return
-
-        # Call the superclass action() method.
-        # As a side effect, self.added_object is set by add() above.
-        super(ComponentAdding, self).action(type_name, id)
-
-    _addFilterInterface = None
-
-    def addingInfo(self):
-        # A site management folder can have many things. We only want
-        # things that implement a particular interface
-        info = super(ComponentAdding, self).addingInfo()
-        if self._addFilterInterface is None:
-            return info
-        out = []
-        for item in info:
-            extra = item.get('extra')
-            if extra:
-                factoryname = extra.get('factory')
-                if factoryname:
-                    factory = zope.component.getUtility(IFactory, factoryname)
-                    intf = factory.getInterfaces()
-                    if not intf.extends(self._addFilterInterface):
-                        # We only skip new addMenuItem style objects
-                        # that don't implement our wanted interface.
-                        continue
-
-            out.append(item)
-
-        return out
-
-
-class UtilityAdding(ComponentAdding):
-    """Adding subclass used for adding utilities."""
-
-    menu_id = None
-    title = _("Add Utility")
-
-    def nextURL(self):
-        v = zope.component.queryMultiAdapter(
-            (self.added_object, self.request), name="addRegistration.html")
-        if v is not None:
-            url = zope.component.absoluteURL(self.added_object, self.request)
-            return url + "/@@addRegistration.html"
-
-        return super(UtilityAdding, self).nextURL()
+from zope.app.component.interfaceindex import searchInterface
+
+# The adding views need zope.app.container
+zope.deferredimport.defineFrom('zope.app.component.browser.adding',
+                               'ComponentAdding',
+                               'UtilityAdding')
 
 
 class MakeSite(BrowserView):
@@ -156,8 +89,57 @@ class MakeSite(BrowserView):
         # We don't want to store security proxies (we can't,
         # actually), so we have to remove proxies here before passing
         # the context to the SiteManager.
+        from zope.site.site import LocalSiteManager
         bare = removeSecurityProxy(self.context)
         sm = LocalSiteManager(bare)
         self.context.setSiteManager(sm)
         self.request.response.redirect(
             "++etc++site/@@SelectedManagementView.html")
+
+
+class MakeSites(BrowserView):
+    """View for converting many possible sites to sites."""
+
+    def addSiteManagers(self):
+        """Convert possible sites to sites and report the throughput as JSON
+
+        The items of the container named in the `ids` form field of a POST
+        request are converted.  With a `chunk` form field, the transaction
+        is committed every `chunk` sites.  Other request methods, missing or
+        unknown ids and bad chunk sizes are reported as errors.
+        """
+        from zope.app.component.bulk import makeSites
+        form = self.request.form
+        response = self.request.response
+        response.setHeader('Content-Type', 'application/json')
+        if self.request.method != 'POST':
+            response.setHeader('Allow', 'POST')
+            return self._error(u'Sites are only made by POST requests', 405)
+        try:
+            chunk = int(form.get('chunk') or 0)
+        except (TypeError, ValueError):
+            chunk = -1
+        if chunk < 0:
+            return self._error(u'The chunk must be a positive number')
+        ids = form.get('ids')
+        if not ids:
+            return self._error(u'No ids given')
+        if isinstance(ids, basestring):
+            ids = [ids]
+        folders = []
+        for id in ids:
+            folder = self.context.get(id)
+            if folder is None:
+                return self._error(u'No item named %s' % id)
+            folders.append(folder)
+
+        start = timeit.default_timer()
+        sites = len(makeSites(folders, chunk))
+        seconds = timeit.default_timer() - start
+        report = {'sites': sites, 'seconds': seconds,
+                  'rate': seconds and sites / seconds or None}
+        return json.dumps(report, sort_keys=True)
+
+    def _error(self, message, status=400):
+        self.request.response.setStatus(status)
+        return json.dumps({'error': message})
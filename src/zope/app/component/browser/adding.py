@@ -0,0 +1,112 @@
+##############################################################################
+#
+# Copyright (c) 2002 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Adding views for registerable components.
+"""
+__docformat__ = 'restructuredtext'
+
+import zope.component
+from zope.component.interfaces import IFactory
+
+from zope.app.component.i18n import ZopeMessageFactory as _
+from zope.app.container.browser.adding import Adding
+from zope.app.component.cache import generation, getCache
+from zope.app.component.cache import queryMultiAdapter
+
+class ComponentAdding(Adding):
+    """Adding subclass used for registerable components."""
+
+    menu_id = "add_component"
+
+    def add(self, content):
+        # Override so as to save a reference to the added object
+        self.added_object = super(ComponentAdding, self).add(content)
+        return self.added_object
+
+    def nextURL(self):
+        v = queryMultiAdapter(
+            (self.added_object, self.request), name="registration.html")
+        if v is not None:
+            url = str(zope.component.getMultiAdapter(
+                (self.added_object, self.request), name='absolute_url'))
+            return url + "/@@registration.html"
+
+        return super(ComponentAdding, self).nextURL()
+
+    def action(self, type_name, id=''):
+        # For special case of that we want to redirect to another adding view
+        # (usually another menu such as AddUtility)
+        if type_name.startswith("../"):
+            # Special case
+            url = type_name
+            if id:
+                url += "?id=" + id
+            self.request.response.redirect(url)
+            return
+
+        # Call the superclass action() method.
+        # As a side effect, self.added_object is set by add() above.
+        super(ComponentAdding, self).action(type_name, id)
+
+    _addFilterInterface = None
+
+    def addingInfo(self):
+        # A site management folder can have many things. We only want
+        # things that implement a particular interface
+        info = super(ComponentAdding, self).addingInfo()
+        if self._addFilterInterface is None:
+            return info
+
+        # Whether a factory passes the filter only changes with the
+        # factory registrations, so we remember it until they change.
+        sm = zope.component.getSiteManager()
+        cache = getCache(sm, 'ComponentAdding.addingInfo',
+                         generation(sm.utilities))
+        out = []
+        for item in info:
+            extra = item.get('extra')
+            if extra:
+                factoryname = extra.get('factory')
+                if factoryname:
+                    key = factoryname, self._addFilterInterface
+                    extends = cache.get(key)
+                    if extends is None:
+                        factory = zope.component.getUtility(
+                            IFactory, factoryname)
+                        intf = factory.getInterfaces()
+                        extends = bool(intf.extends(self._addFilterInterface))
+                        cache[key] = extends
+                    if not extends:
+                        # We only skip new addMenuItem style objects
+                        # that don't implement our wanted interface.
+                        continue
+
+            out.append(item)
+
+        return out
+
+
+class UtilityAdding(ComponentAdding):
+    """Adding subclass used for adding utilities."""
+
+    menu_id = None
+    title = _("Add Utility")
+
+    def nextURL(self):
+        v = queryMultiAdapter(
+            (self.added_object, self.request), name="addRegistration.html")
+        if v is not None:
+            url = zope.component.absoluteURL(self.added_object, self.request)
+            return url + "/@@addRegistration.html"
+
+        return super(UtilityAdding, self).nextURL()
@@ -0,0 +1,55 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""View reporting the component lookup statistics
+"""
+__docformat__ = 'restructuredtext'
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from zope.publisher.browser import BrowserPage
+
+from zope.app.component import instrumentation
+
+
+class LookupStatistics(BrowserPage):
+    """Report the component lookup statistics as JSON
+
+    The `action` form field can be ``enable``, ``disable`` or ``reset``;
+    the report is made before the statistics are reset.
+
+      >>> from zope.publisher.browser import TestRequest
+      >>> view = LookupStatistics(None, TestRequest(form={'action': 'reset'}))
+      >>> report = json.loads(view())
+      >>> report['enabled'], report['adapter_hook']['calls']
+      (False, 0)
+
+    """
+
+    def __call__(self):
+        action = self.request.form.get('action')
+        if action == 'enable':
+            instrumentation.enable()
+        elif action == 'disable':
+            instrumentation.disable()
+
+        report = instrumentation.statistics()
+        report['enabled'] = instrumentation.enabled()
+        if action == 'reset':
+            instrumentation.resetStatistics()
+
+        self.request.response.setHeader('Content-Type', 'application/json')
+        return json.dumps(report, sort_keys=True)
@@ -13,33 +13,267 @@
 ##############################################################################
 """General registry-related views
 """
+import base64
+import bisect
+import csv
+import hashlib
+import sys
+import urllib
 import warnings
 
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
 from zope import interface, component, schema
 from zope.formlib import form
 from zope.publisher.browser import BrowserPage
+from zope.security.interfaces import Unauthorized
 from zope.security.proxy import removeSecurityProxy
+from zope.component.registry import UtilityRegistration
+from zope.traversing.api import traverse
+from zope.traversing.browser.absoluteurl import AbsoluteURL
 import zope.component.interfaces
+import zope.interface.interfaces
 import zope.publisher.interfaces.browser
 
 import zope.app.pagetemplate
 from zope.app.component.i18n import ZopeMessageFactory as _
+from zope.app.component.index import getRegistrationIndex
+from zope.app.component.index import registrationStamp
+from zope.app.component.index import dottedName as _dottedName
+from zope.app.component.bulk import registerUtilities, unregisterUtilities
 
 
 def _registrations(context, comp):
     sm = component.getSiteManager(context)
-    for r in sm.registeredUtilities():
-        if r.component == comp or comp is None:
+    if comp is not None:
+        # Use the reverse index rather than scanning all registrations
+        for r in getRegistrationIndex(sm).registrations(comp):
             yield r
+        return
+    for r in sm.registeredUtilities():
+        yield r
     for r in sm.registeredAdapters():
-        if r.factory == comp or comp is None:
-            yield r
+        yield r
     for r in sm.registeredSubscriptionAdapters():
-        if r.factory == comp or comp is None:
-            yield r
+        yield r
     for r in sm.registeredHandlers():
-        if r.factory == comp or comp is None:
-            yield r
+        yield r
+
+def _sorted(context, comp):
+    """Return the sort keys and the sorted registrations to show
+
+    These are the registrations of `comp`, or all registrations of the
+    site manager if `comp` is None.  The keys are kept by the registration
+    index, so the registrations are not compared with each other.
+    """
+    sm = component.getSiteManager(context)
+    return getRegistrationIndex(sm).sorted(comp)
+
+def _unregister(displays):
+    """Unregister the registrations of display adapters
+
+    Utility registrations are removed together, so that the registry caches
+    are invalidated once for all of them.  Displays that unregister in
+    their own way are left to do so:
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> sm.registerUtility(object(), interface.Interface, u'one')
+      >>> sm.registerUtility(object(), interface.Interface, u'two')
+      >>> one, two = sorted(sm.registeredUtilities(), key=lambda r: r.name)
+
+      >>> unregistered = []
+      >>> class Display(UtilityRegistrationDisplay):
+      ...     def unregister(self):
+      ...         unregistered.append(self.context.name)
+      >>> _unregister([UtilityRegistrationDisplay(one, None),
+      ...              Display(two, None)])
+      >>> unregistered
+      [u'two']
+      >>> [r.name for r in sm.registeredUtilities()]
+      [u'two']
+
+    """
+    utilities = []
+    for display in displays:
+        if (isinstance(display, UtilityRegistrationDisplay)
+            and display.__class__.unregister
+                == UtilityRegistrationDisplay.unregister):
+            utilities.append(display.context)
+        else:
+            display.unregister()
+    if utilities:
+        unregisterUtilities(utilities)
+
+def _encodeCursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key))
+
+def _decodeCursor(cursor):
+    # The cursor is the key of the last registration of the previous page:
+    # the sort key and the number telling registrations with the same sort
+    # key apart, see the registration index
+    try:
+        key = json.loads(base64.urlsafe_b64decode(str(cursor)))
+        if len(key) != 6 or not isinstance(key[5], int):
+            return None
+        key[2] = tuple(key[2])
+        return tuple(key)
+    except (ValueError, TypeError, IndexError, KeyError):
+        # Not one of ours, start from the beginning
+        return None
+
+# Registration ids start with a letter telling the kind of registration,
+# followed by the data needed to find the registration again.
+_kinds = {'R': 'utility'}
+
+def _utilityId(provided, name):
+    return 'R' + (base64.b64encode((u"%s %s" % (provided, name))
+                                   .encode('utf8'))
+                  .replace('+', '_')
+                  .replace('=', '')
+                  )
+
+def _parseId(id):
+    """Return the kind, provided interface name and name of a registration id
+
+      >>> _parseId(_utilityId('zope.app.IFoo', u'bob'))
+      ('utility', u'zope.app.IFoo', u'bob')
+      >>> _parseId(_utilityId('zope.app.IFoo', u''))
+      ('utility', u'zope.app.IFoo', u'')
+
+    Anything else gives None:
+
+      >>> _parseId('Rnonsense') is None
+      True
+      >>> _parseId('Xyz') is None
+      True
+
+    """
+    kind = _kinds.get(id[:1])
+    if kind is None:
+        return None
+    try:
+        data = str(id[1:]).replace('_', '+')
+        data += '=' * (-len(data) % 4)
+        provided, name = base64.b64decode(data).decode('utf8').split(u' ', 1)
+    except (TypeError, ValueError, UnicodeError):
+        return None
+    return kind, provided, name
+
+def _findUtilityRegistration(sm, provided, name):
+    """Return the utility registration for a dotted interface name and name
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> sm.registerUtility(object(), interface.Interface, u'one')
+      >>> _findUtilityRegistration(sm, 'zope.interface.Interface', u'one'
+      ...                          ).name
+      u'one'
+
+    Names that are not interfaces are looked for among the registrations:
+
+      >>> _findUtilityRegistration(sm, 'sys.path', u'one') is None
+      True
+      >>> _findUtilityRegistration(sm, 'zope.interface.Interface', u'two'
+      ...                          ) is None
+      True
+
+    """
+    module, iname = provided.rsplit('.', 1) if '.' in provided else ('', '')
+    # Registered interfaces have been imported already, we never import
+    # anything given in a request
+    try:
+        iface = getattr(sys.modules.get(str(module)), str(iname), None)
+    except UnicodeError:
+        iface = None
+    registrations = getattr(sm, '_utility_registrations', None)
+    if (registrations is not None
+        and zope.interface.interfaces.IInterface.providedBy(iface)):
+        data = registrations.get((iface, name))
+        if data is not None:
+            return UtilityRegistration(sm, iface, name, *data)
+    for r in sm.registeredUtilities():
+        if r.name == name and _dottedName(r.provided) == provided:
+            return r
+    return None
+
+# Characters not quoted in URLs, as in zope.traversing
+_safe = '@+'
+
+class _URLs(object):
+    """Absolute URLs of objects, sharing the URLs of common parents
+
+    Objects with the standard absolute URL adapter get the URL of their
+    parent, which is computed once, plus their name.  Objects that have no
+    URL get ``None``:
+
+      >>> from zope.publisher.browser import TestRequest
+      >>> from zope.traversing.browser.absoluteurl import SiteAbsoluteURL
+      >>> from zope.traversing.interfaces import IContainmentRoot
+      >>> component.provideAdapter(AbsoluteURL, (None, None),
+      ...                          interface.Interface, name='absolute_url')
+      >>> component.provideAdapter(SiteAbsoluteURL, (IContainmentRoot, None),
+      ...                          interface.Interface, name='absolute_url')
+
+      >>> class Object(object):
+      ...     def __init__(self, parent=None, name=None):
+      ...         self.__parent__ = parent
+      ...         self.__name__ = name
+      >>> class Root(Object):
+      ...     interface.implements(IContainmentRoot)
+
+      >>> root = Root()
+      >>> folder = Object(root, u'folder')
+      >>> urls = _URLs(TestRequest())
+      >>> urls(Object(folder, u'one'))
+      'http://127.0.0.1/folder/one'
+      >>> urls(Object(folder, u'two words'))
+      'http://127.0.0.1/folder/two%20words'
+      >>> urls(Object(Object(), u'lost')) is None
+      True
+
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._urls = {}
+
+    def __call__(self, obj):
+        # The objects are kept with their URLs, so their ids are not reused
+        try:
+            return self._urls[id(obj)][1]
+        except KeyError:
+            pass
+        url = self._url(obj)
+        self._urls[id(obj)] = obj, url
+        return url
+
+    def _url(self, obj):
+        adapter = component.queryMultiAdapter(
+            (obj, self.request), name='absolute_url')
+        if adapter is None:
+            return None
+        if type(adapter) is not AbsoluteURL:
+            try:
+                return adapter()
+            except TypeError:
+                return None
+
+        if obj is removeSecurityProxy(self.request.getVirtualHostRoot()):
+            return self.request.getApplicationURL()
+        parent = getattr(obj, '__parent__', None)
+        name = getattr(obj, '__name__', None)
+        if parent is None or name is None:
+            return None
+        url = self(parent)
+        if url is None:
+            return None
+        if name:
+            url += '/' + urllib.quote(name.encode('utf-8'), _safe)
+        return url
 
 class IRegistrationDisplay(interface.Interface):
     """Display registration information
@@ -65,21 +299,117 @@ class RegistrationView(BrowserPage):
 
     render = zope.app.pagetemplate.ViewPageTemplateFile('registration.pt')
 
+    # The interface of the display adapters used for the registrations
+    display = IRegistrationDisplay
+
+    _displays = None
+
     def registrations(self):
-        registrations = [
-            component.getMultiAdapter((r, self.request), IRegistrationDisplay)
-            for r in sorted(_registrations(self.context, self.context))
-            ]
-        return registrations
+        if self._displays is None:
+            self._displays = [
+                component.getMultiAdapter((r, self.request), self.display)
+                for r in _sorted(self.context, self.context)[1]
+                ]
+        return self._displays
+
+    def _lists(self, registration):
+        """Tell whether a registration is one of those shown by the view"""
+        return registration.component is removeSecurityProxy(self.context)
+
+    def _selected(self, ids):
+        """Return display adapters for the registrations with the given ids
+        """
+        sm = component.getSiteManager(self.context)
+        selected = []
+        unknown = []
+        for id in ids:
+            parsed = _parseId(id)
+            if parsed is None:
+                unknown.append(id)
+                continue
+            kind, provided, name = parsed
+            r = _findUtilityRegistration(sm, provided, name)
+            if r is not None and self._lists(r):
+                selected.append(
+                    component.getMultiAdapter((r, self.request), self.display))
+        if unknown:
+            # These ids come from other display adapters; we can only find
+            # them by asking all of them.
+            registrations = dict([(r.id(), r) for r in self.registrations()])
+            selected.extend(
+                [registrations[id] for id in unknown if id in registrations])
+        return selected
 
     def update(self):
-        registrations = dict([(r.id(), r) for r in self.registrations()])
-        for id in self.request.form.get('ids', ()):
-            r = registrations.get(id)
-            if r is not None:
-                r.unregister()
+        ids = self.request.form.get('ids', ())
+        if not ids:
+            return
+        _unregister(self._selected(ids))
+        self._displays = None
+
+    def etag(self):
+        """Return an entity tag for the page
+
+        It changes when the registrations of the site manager change, and
+        depends on the listed object, the request parameters, the user and
+        the languages the user accepts.  Moving or renaming a registered
+        component does not change it.
+        """
+        sm = component.getSiteManager(self.context)
+        context = removeSecurityProxy(self.context)
+        data = (self.__class__.__name__,
+                getattr(context, '_p_oid', None) or id(context),
+                registrationStamp(sm),
+                sorted(self.request.form.items()),
+                getattr(self.request.principal, 'id', None),
+                self.request.getHeader('Accept-Language'),
+                )
+        return '"%s"' % hashlib.md5(repr(data)).hexdigest()
+
+    def notModified(self):
+        """Tell whether the client has an up-to-date copy of the page
+
+        The ETag header is set for GET and HEAD requests that don't change
+        the registrations:
+
+          >>> from zope.interface import Interface
+          >>> from zope.component.registry import Components
+          >>> sm = Components()
+          >>> sm.registerUtility(sm, Interface)
+
+          >>> from zope.publisher.browser import TestRequest
+          >>> request = TestRequest()
+          >>> RegistrationView(sm, request).notModified()
+          False
+          >>> etag = request.response.getHeader('ETag')
+
+        A client sending this tag gets a "not modified" answer, until the
+        registrations change:
+
+          >>> request = TestRequest(environ={'HTTP_IF_NONE_MATCH': etag})
+          >>> RegistrationView(sm, request).notModified()
+          True
+          >>> sm.registerUtility(sm, Interface, u'again')
+          >>> RegistrationView(sm, request).notModified()
+          False
+
+        """
+        if (self.request.method not in ('GET', 'HEAD')
+            or self.request.form.get('ids')):
+            return False
+        etag = self.etag()
+        self.request.response.setHeader('ETag', etag)
+        match = self.request.getHeader('If-None-Match')
+        if not match:
+            return False
+        tags = [tag.strip() for tag in match.split(',')]
+        return '*' in tags or etag in tags or 'W/' + etag in tags
 
     def __call__(self):
+        if self.notModified():
+            # Nothing to sort, adapt or render
+            self.request.response.setStatus(304)
+            return u''
         self.update()
         return self.render()
 
@@ -99,13 +429,7 @@ class UtilityRegistrationDisplay(object):
         return provided.__module__ + '.' + provided.__name__
 
     def id(self):
-        return 'R' + (("%s %s" % (self.provided(), self.context.name))
-                      .encode('utf8')
-                      .encode('base64')
-                      .replace('+', '_')
-                      .replace('=', '')
-                      .replace('\n', '')
-                      )
+        return _utilityId(self.provided(), self.context.name)
 
     def _comment(self):
         comment = self.context.info or ''
@@ -141,26 +465,156 @@ class SiteRegistrationView(RegistrationView):
 
     render = zope.app.pagetemplate.ViewPageTemplateFile('siteregistration.pt')
 
+    # Number of registrations shown per page.  ``None`` shows all of them,
+    # unless a ``batch_size`` is passed in the request.
+    batch_size = None
+
+    nextCursor = None
+
+    def batchSize(self):
+        try:
+            size = int(self.request.form.get('batch_size', self.batch_size))
+        except (TypeError, ValueError):
+            return None
+        if size <= 0:
+            return None
+        return size
+
+    def cursor(self):
+        return self.request.form.get('cursor') or None
+
+    def _batch(self, keys, registrations):
+        """Return the registrations of the requested page
+
+        `keys` and `registrations` are the sort keys and the registrations,
+        in sort order:
+
+          >>> from zope.interface import Interface
+          >>> class IObject(Interface):
+          ...     pass
+
+          >>> from zope.component.registry import Components
+          >>> sm = Components()
+          >>> for name in u'edcba':
+          ...     sm.registerUtility(object(), IObject, name)
+          >>> keys, registrations = _sorted(sm, None)
+
+        Without a batch size, all registrations are returned:
+
+          >>> from zope.publisher.browser import TestRequest
+          >>> view = SiteRegistrationView(None, TestRequest())
+          >>> len(view._batch(keys, registrations))
+          5
+
+        With a batch size, we only get one page and a cursor pointing to
+        the next one:
+
+          >>> request = TestRequest(form={'batch_size': '2'})
+          >>> view = SiteRegistrationView(None, request)
+          >>> [r.name for r in view._batch(keys, registrations)]
+          [u'a', u'b']
+
+          >>> request.form['cursor'] = view.nextCursor
+          >>> view = SiteRegistrationView(None, request)
+          >>> [r.name for r in view._batch(keys, registrations)]
+          [u'c', u'd']
+
+          >>> request.form['cursor'] = view.nextCursor
+          >>> view = SiteRegistrationView(None, request)
+          >>> [r.name for r in view._batch(keys, registrations)]
+          [u'e']
+          >>> view.nextCursor is None
+          True
+
+        Registrations with the same sort key are not skipped at the end of
+        a page:
+
+          >>> def handler(event):
+          ...     pass
+          >>> for i in range(3):
+          ...     sm.registerHandler(handler, (IObject, ), info=u'comment')
+          >>> keys, registrations = _sorted(sm, None)
+          >>> request = TestRequest(form={'batch_size': '2'})
+          >>> view = SiteRegistrationView(None, request)
+          >>> len(view._batch(keys, registrations))
+          2
+          >>> request.form['cursor'] = view.nextCursor
+          >>> view = SiteRegistrationView(None, request)
+          >>> [r.__class__.__name__ for r in view._batch(keys, registrations)]
+          ['HandlerRegistration', 'UtilityRegistration']
+
+        The comments of the registrations are not part of the cursors:
+
+          >>> 'comment' in base64.urlsafe_b64decode(request.form['cursor'])
+          False
+
+        """
+        size = self.batchSize()
+        if size is None:
+            return list(registrations)
+
+        first = 0
+        cursor = self.cursor()
+        if cursor is not None:
+            start = _decodeCursor(cursor)
+            if start is not None:
+                first = bisect.bisect_right(keys, start)
+        page = registrations[first:first + size]
+        if first + size < len(registrations):
+            self.nextCursor = _encodeCursor(keys[first + size - 1])
+        else:
+            self.nextCursor = None
+        return page
+
+    display = ISiteRegistrationDisplay
+
     def registrations(self):
-        registrations = [
-            component.getMultiAdapter((r, self.request),
-                                      ISiteRegistrationDisplay)
-            for r in sorted(_registrations(self.context, None))
-            ]
-        return registrations
+        if self._displays is None:
+            self._displays = [
+                component.getMultiAdapter((r, self.request), self.display)
+                for r in self._batch(*_sorted(self.context, None))
+                ]
+            # Most components are in the same few folders, their displays
+            # share the URLs of these folders
+            urls = _URLs(self.request)
+            for display in self._displays:
+                if hasattr(display, 'urls'):
+                    display.urls = urls
+        return self._displays
+
+    def _lists(self, registration):
+        return True
+
+    def _batchURL(self, cursor):
+        query = {'batch_size': self.batchSize()}
+        if cursor is not None:
+            query['cursor'] = cursor
+        return '%s?%s' % (self.request.URL, urllib.urlencode(query))
+
+    def nextBatchURL(self):
+        self.registrations()
+        if self.nextCursor is None:
+            return None
+        return self._batchURL(self.nextCursor)
+
+    def firstBatchURL(self):
+        if self.batchSize() is None or self.cursor() is None:
+            return None
+        return self._batchURL(None)
 
 class UtilitySiteRegistrationDisplay(UtilityRegistrationDisplay):
     """Utility Registration Details"""
 
     interface.implementsOnly(ISiteRegistrationDisplay)
 
+    # URL cache shared by the displays of a view, see _URLs
+    urls = None
+
     def render(self):
-        url = component.getMultiAdapter(
-            (self.context.component, self.request), name='absolute_url')
-        try:
-            url = url()
-        except TypeError:
-            url = ""
+        urls = self.urls
+        if urls is None:
+            urls = _URLs(self.request)
+        url = urls(self.context.component) or ""
 
         cname = getattr(self.context.component, '__name__', '')
         if not cname:
@@ -263,3 +717,187 @@ class AddUtilityRegistration(form.Form):
             return
 
         self.request.response.redirect('@@registration.html')
+
+class AddUtilityRegistrations(BrowserPage):
+    r"""Register many utilities with a single request
+
+    The registrations are posted as JSON, a list of objects with `path`,
+    `provided`, `name` and `comment` keys (or lists of these values in this
+    order), or as CSV with the same columns.  They are taken from the
+    `registrations` form field, or else from the request body.
+
+    `path` is the path of the component, relative to the context or
+    absolute; `provided` is the dotted name of one of the interfaces the
+    component provides.  All rows are checked before anything is
+    registered; if any row is invalid, nothing is registered.  The response
+    is a JSON object listing the registrations made and the errors per row.
+
+      >>> from zope.traversing.adapters import DefaultTraversable, Traverser
+      >>> from zope.traversing.interfaces import ITraversable, ITraverser
+      >>> component.provideAdapter(Traverser, (None, ), ITraverser)
+      >>> component.provideAdapter(DefaultTraversable, (None, ), ITraversable)
+
+      >>> from zope.location.traversing import LocationPhysicallyLocatable
+      >>> component.provideAdapter(LocationPhysicallyLocatable)
+      >>> from zope.site.site import LocalSiteManager, SiteManagerAdapter
+      >>> component.provideAdapter(SiteManagerAdapter)
+
+      >>> from zope.location.interfaces import IRoot
+      >>> from zope.site.folder import Folder
+      >>> class SecretFolder(Folder):
+      ...     def __getitem__(self, name):
+      ...         if name == 'secret':
+      ...             raise Unauthorized(name)
+      ...         return Folder.__getitem__(self, name)
+      >>> folder = SecretFolder()
+      >>> interface.alsoProvides(folder, IRoot)
+      >>> folder['one'] = Folder()
+      >>> folder['two'] = Folder()
+      >>> folder.setSiteManager(LocalSiteManager(folder))
+      >>> sm = folder.getSiteManager()
+
+      >>> from zope.publisher.browser import TestRequest
+      >>> def post(data):
+      ...     request = TestRequest(form={'registrations': data})
+      ...     result = AddUtilityRegistrations(folder, request)()
+      ...     return json.loads(result), request.response.getStatus()
+
+    The rows can be posted as JSON:
+
+      >>> result, status = post(json.dumps([
+      ...     {'path': 'one', 'provided': 'zope.interface.Interface',
+      ...      'name': 'one', 'comment': 'The first one'}]))
+      >>> [(r['provided'], r['name']) for r in result['registered']]
+      [(u'zope.interface.Interface', u'one')]
+      >>> sm.getUtility(interface.Interface, u'one') is folder['one']
+      True
+
+    or as CSV, with or without a header:
+
+      >>> result, status = post('path,provided,name,comment\n'
+      ...                       'two,zope.interface.Interface,two,\n')
+      >>> [(r['provided'], r['name']) for r in result['registered']]
+      [(u'zope.interface.Interface', u'two')]
+
+    The errors are reported per row, with the number of the row:
+
+      >>> result, status = post(json.dumps([
+      ...     {'path': 'missing', 'provided': 'zope.interface.Interface'},
+      ...     {'path': 'secret', 'provided': 'zope.interface.Interface'},
+      ...     {'path': 'one', 'provided': 'zope.app.IFoo'},
+      ...     ['one', 'zope.interface.Interface', 'three'],
+      ...     ['two', 'zope.interface.Interface', 'three']]))
+      >>> status
+      400
+      >>> [error['row'] for error in result['errors']]
+      [0, 1, 2, 4]
+      >>> result['errors'][1]['error']
+      u'Not allowed to access secret'
+      >>> result['errors'][3]['error']
+      u'Same interface and name as row 3'
+
+    and nothing is registered then:
+
+      >>> result['registered']
+      []
+      >>> sm.queryUtility(interface.Interface, u'three') is None
+      True
+
+    Data that can't be parsed is an error of the whole request:
+
+      >>> result, status = post('[not json')
+      >>> status, [error['row'] for error in result['errors']]
+      (400, [None])
+
+    """
+
+    component.adapts(None, zope.publisher.interfaces.browser.IBrowserRequest)
+
+    columns = ('path', 'provided', 'name', 'comment')
+
+    def _data(self):
+        data = self.request.form.get('registrations')
+        if data is None:
+            data = self.request.bodyStream.read()
+        if isinstance(data, unicode):
+            data = data.encode('utf8')
+        return data.strip()
+
+    def rows(self, data):
+        """Return the posted rows as dictionaries"""
+        if data.startswith('['):
+            rows = json.loads(data)
+        else:
+            rows = [[cell.decode('utf8') for cell in row]
+                    for row in csv.reader(data.splitlines()) if row]
+            if rows and rows[0][:1] == [self.columns[0]]:
+                # Header
+                del rows[0]
+        return [isinstance(row, dict) and row or dict(zip(self.columns, row))
+                for row in rows]
+
+    def resolve(self, row):
+        """Return the component, interface, name and comment of a row
+
+        Raises ValueError if the row is not valid.
+        """
+        path = row.get('path')
+        if not path:
+            raise ValueError("No component path given")
+        try:
+            comp = traverse(self.context, path)
+        except Unauthorized:
+            raise ValueError("Not allowed to access %s" % path)
+        except (KeyError, LookupError, TypeError, AttributeError):
+            raise ValueError("No component found at %s" % path)
+        comp = removeSecurityProxy(comp)
+
+        provided = row.get('provided') or ''
+        for iface in interface.providedBy(comp).flattened():
+            if _dottedName(iface) == provided:
+                break
+        else:
+            raise ValueError("The component at %s doesn't provide %s"
+                             % (path, provided))
+        return comp, iface, row.get('name') or u'', row.get('comment') or u''
+
+    def __call__(self):
+        response = self.request.response
+        response.setHeader('Content-Type', 'application/json')
+        try:
+            rows = self.rows(self._data())
+        except (ValueError, TypeError, csv.Error) as e:
+            response.setStatus(400)
+            return json.dumps({'registered': [],
+                               'errors': [{'row': None, 'error': unicode(e)}]})
+
+        entries = []
+        errors = []
+        keys = {}
+        for number, row in enumerate(rows):
+            try:
+                entry = self.resolve(row)
+            except ValueError as e:
+                errors.append({'row': number, 'error': unicode(e)})
+                continue
+            key = entry[1], entry[2]
+            if key in keys:
+                errors.append({'row': number,
+                               'error': "Same interface and name as row %d"
+                                        % keys[key]})
+                continue
+            keys[key] = number
+            entries.append(entry)
+
+        if errors:
+            response.setStatus(400)
+            return json.dumps({'registered': [], 'errors': errors})
+
+        sm = component.getSiteManager(self.context)
+        registered = registerUtilities(sm, entries)
+        return json.dumps({
+            'registered': [{'provided': _dottedName(r.provided),
+                            'name': r.name}
+                           for r in registered],
+            'errors': [],
+            })
@@ -14,14 +14,13 @@
 """Registration functional tests
 """
 from zope import interface
-from zope.app.component.testing import AppComponentLayer
-from zope.app.testing import functional
+from zope.app.component.testing import AppComponentLayer, CachedZCMLLayer
 import doctest
 import os.path
 import unittest
 import zope.app.testing.functional
 
-AppComponentBrowserLayer = functional.ZCMLLayer(
+AppComponentBrowserLayer = CachedZCMLLayer(
     os.path.join(os.path.dirname(__file__), 'ftesting.zcml'),
     __name__, 'AppComponentBrowserLayer', allow_teardown=True)
 
@@ -40,7 +39,11 @@ def test_suite():
         "site.txt",
         optionflags=doctest.ELLIPSIS | doctest.NORMALIZE_WHITESPACE)
     site.layer = AppComponentBrowserLayer
-    return unittest.TestSuite((site,))
+    bulk = zope.app.testing.functional.FunctionalDocFileSuite(
+        "bulk.txt",
+        optionflags=doctest.ELLIPSIS | doctest.NORMALIZE_WHITESPACE)
+    bulk.layer = AppComponentBrowserLayer
+    return unittest.TestSuite((site, bulk))
 
 if __name__ == '__main__':
     unittest.main(defaultTest='test_suite')
@@ -0,0 +1,350 @@
+"""Bulk registry operations
+
+Every registration or unregistration through a site manager invalidates the
+lookup caches of the affected registry and of all registries based on it.
+The functions in this module make many changes at once: the registries
+based on the changed one are invalidated a single time after all changes
+have been made.
+
+`makeSites` turns many possible sites into sites in one pass.
+"""
+__docformat__ = 'restructuredtext'
+
+import contextlib
+
+import transaction
+import zope.event
+from zope.component.interfaces import IPossibleSite, ISite
+from zope.component.persistentregistry import PersistentComponents
+from zope.component.registry import UtilityRegistration
+from zope.container.btree import BTreeContainer
+from zope.container.interfaces import IReadContainer
+from zope.lifecycleevent import ObjectCreatedEvent
+from zope.location.interfaces import IRoot
+from zope.security.proxy import removeSecurityProxy
+
+from zope.app.component.site import LocalSiteManager, SiteManagementFolder
+from zope.app.component.site import _nextSiteManager
+
+
+class _DeferredLookup(object):
+    # Stands in for the lookup of a registry, recording the changes that
+    # would invalidate its caches.  The caches are cleared before the
+    # lookup is used again, so that lookups in between see the changes.
+
+    def __init__(self, lookup):
+        self._lookup = lookup
+        self._changed = False
+        self._stale = False
+
+    def __getattr__(self, name):
+        if self._stale:
+            self._stale = False
+            self._lookup.changed(None)
+        return getattr(self._lookup, name)
+
+    def changed(self, originally_changed):
+        self._changed = self._stale = True
+
+
+class _DeferredSubregistries(object):
+    # Stands in for the registries based on a registry: they are added and
+    # removed as usual, but not told about the changes
+
+    def __init__(self, subregistries):
+        self._subregistries = subregistries
+
+    def __setitem__(self, registry, value):
+        self._subregistries[registry] = value
+
+    def __delitem__(self, registry):
+        del self._subregistries[registry]
+
+    def __contains__(self, registry):
+        return registry in self._subregistries
+
+    def keys(self):
+        return []
+
+
+@contextlib.contextmanager
+def deferredChanges(*registries):
+    """Invalidate the registries based on `registries` once, on exit.
+
+    Adapter registries tell their lookup and the registries based on them
+    about every modification.  Within this context manager the registries
+    based on them are told only once, on exit:
+
+      >>> from zope.interface import Interface
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> from zope.interface.adapter import AdapterRegistry
+      >>> registry = AdapterRegistry()
+      >>> sub = AdapterRegistry((registry, ))
+      >>> generation = sub._generation
+
+      >>> with deferredChanges(registry):
+      ...     registry.register((), IObject, u'one', 1)
+      ...     registry.register((), IObject, u'two', 2)
+      ...     sub._generation == generation
+      True
+
+      >>> sub._generation == generation + 1
+      True
+      >>> sub.lookup((), IObject, u'two')
+      2
+
+    The registry itself sees its changes right away:
+
+      >>> with deferredChanges(registry):
+      ...     registry.register((), IObject, u'three', 3)
+      ...     registry.lookup((), IObject, u'three')
+      3
+
+    Registries based on `registries` while the changes are deferred are
+    kept:
+
+      >>> with deferredChanges(registry):
+      ...     later = AdapterRegistry((registry, ))
+      >>> later in registry._v_subregistries
+      True
+
+    Only the volatile attributes of the registries are replaced for the
+    duration, so persistent registries are not changed by this.  Persistent
+    registries don't keep track of the registries based on them, which
+    check the generations of their bases instead.
+    """
+    deferred = []
+    for registry in registries:
+        activate = getattr(registry, '_p_activate', None)
+        if activate is not None:
+            # The volatile attributes are set when the state is loaded
+            activate()
+        lookup = _DeferredLookup(registry._v_lookup)
+        subregistries = getattr(registry, '_v_subregistries', None)
+        deferred.append((registry, lookup, subregistries))
+        registry._v_lookup = lookup
+        if subregistries is not None:
+            registry._v_subregistries = _DeferredSubregistries(subregistries)
+    try:
+        yield
+    finally:
+        for registry, lookup, subregistries in deferred:
+            registry._v_lookup = lookup._lookup
+            if subregistries is not None:
+                registry._v_subregistries = subregistries
+        for registry, lookup, subregistries in deferred:
+            if lookup._changed:
+                registry.changed(registry)
+
+
+def unregisterUtilities(registrations):
+    """Remove several utility registrations at once.
+
+    `registrations` are utility registrations as returned by the
+    `registeredUtilities` method of a site manager; they may belong to
+    different site managers.  Registrations that are no longer current are
+    skipped.  The registrations that were removed are returned.
+
+      >>> from zope.interface import Interface
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> one, two = object(), object()
+      >>> sm.registerUtility(one, IObject, u'one')
+      >>> sm.registerUtility(one, IObject, u'uno')
+      >>> sm.registerUtility(two, IObject, u'two')
+
+      >>> removed = unregisterUtilities(
+      ...     [r for r in sm.registeredUtilities() if r.component is one])
+      >>> sorted([r.name for r in removed])
+      [u'one', u'uno']
+      >>> [r.name for r in sm.registeredUtilities()]
+      [u'two']
+      >>> sm.queryUtility(IObject, u'one') is None
+      True
+      >>> sm.getAllUtilitiesRegisteredFor(IObject) == [two]
+      True
+
+    The utilities are unregistered with `unregisterUtility`, which sends an
+    `Unregistered` event for each of them.  A component can be registered
+    again afterwards:
+
+      >>> sm.registerUtility(one, IObject, u'one')
+      >>> len(sm.getAllUtilitiesRegisteredFor(IObject))
+      2
+
+    """
+    byregistry = {}
+    for registration in registrations:
+        byregistry.setdefault(registration.registry, []).append(registration)
+
+    removed = []
+    for sm, registrations in byregistry.items():
+        with deferredChanges(sm.utilities):
+            for registration in registrations:
+                if sm.unregisterUtility(registration.component,
+                                        registration.provided,
+                                        registration.name):
+                    removed.append(registration)
+    return removed
+
+
+def registerUtilities(sm, entries):
+    """Register several utilities in the site manager `sm` at once.
+
+    `entries` are ``(component, provided, name, info)`` tuples.  Existing
+    registrations with the same provided interface and name are replaced,
+    just like `registerUtility` does.  The new registrations are returned.
+
+      >>> from zope.interface import Interface
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> one, two = object(), object()
+      >>> sm.registerUtility(two, IObject, u'one')
+
+      >>> registered = registerUtilities(sm, [
+      ...     (one, IObject, u'one', u'first'),
+      ...     (one, IObject, u'uno', u''),
+      ...     (two, IObject, u'two', u''),
+      ...     ])
+      >>> sorted([r.name for r in registered])
+      [u'one', u'two', u'uno']
+
+      >>> sm.getUtility(IObject, u'one') is one
+      True
+      >>> sorted([(r.name, r.info) for r in sm.registeredUtilities()])
+      [(u'one', u'first'), (u'two', u''), (u'uno', u'')]
+      >>> len(sm.getAllUtilitiesRegisteredFor(IObject))
+      2
+
+    Registering the same thing again does nothing:
+
+      >>> registerUtilities(sm, [(one, IObject, u'one', u'first')])
+      []
+
+    The utilities are registered with `registerUtility`, which sends the
+    `Registered` and `Unregistered` events.
+    """
+    registered = []
+    with deferredChanges(sm.utilities):
+        for component, provided, name, info in entries:
+            # Only read here, `registerUtility` keeps it up to date
+            old = sm._utility_registrations.get((provided, name))
+            if old is not None and old[:2] == (component, info):
+                continue
+            sm.registerUtility(component, provided, name, info)
+            registered.append(
+                UtilityRegistration(sm, provided, name, component, info))
+    return registered
+
+
+def possibleSites(ob):
+    """Return the possible sites in and below `ob` that are no sites yet.
+
+    Containers come before the objects in them.
+    """
+    stack = [ob]
+    while stack:
+        ob = stack.pop()
+        if IPossibleSite.providedBy(ob) and not ISite.providedBy(ob):
+            yield ob
+        if IReadContainer.providedBy(ob):
+            values = list(ob.values())
+            values.reverse()
+            stack.extend(values)
+
+
+def _newSiteManager(site, next):
+    # This is `LocalSiteManager(site)`, with the next site manager passed
+    # in instead of looked up in the parents of the site
+    sm = LocalSiteManager.__new__(LocalSiteManager)
+    BTreeContainer.__init__(sm)
+    PersistentComponents.__init__(sm)
+    sm.__parent__ = site
+    sm.__name__ = '++etc++site'
+    sm.__bases__ = (next, )
+    folder = SiteManagementFolder()
+    zope.event.notify(ObjectCreatedEvent(folder))
+    sm['default'] = folder
+    return sm
+
+
+def makeSites(folders, chunk=0):
+    """Make the possible sites `folders` sites.
+
+    Folders that are sites already are skipped.  A folder has to come after
+    the folders containing it, as `possibleSites` returns them, so that its
+    site manager is based on theirs.  The next site manager of the folders
+    in a container that isn't a site is looked up only once for all of
+    them.  The new site managers are returned.
+
+      >>> import zope.component
+      >>> from zope.location.traversing import LocationPhysicallyLocatable
+      >>> zope.component.provideAdapter(LocationPhysicallyLocatable)
+      >>> from zope.site.folder import Folder, rootFolder
+      >>> root = rootFolder()
+      >>> root['a'] = Folder()
+      >>> root['a']['b'] = Folder()
+      >>> root['a']['c'] = Folder()
+      >>> root['d'] = Folder()
+
+      >>> sms = makeSites([root, root['a']['b'], root['a']['c']])
+      >>> len(sms)
+      3
+      >>> root.getSiteManager().__bases__ == (
+      ...     zope.component.getGlobalSiteManager(), )
+      True
+
+    The site managers in ``a``, which isn't a site, are made like the ones
+    in a site:
+
+      >>> sm = root['a']['b'].getSiteManager()
+      >>> sm.__bases__ == (root.getSiteManager(), )
+      True
+      >>> sm.__parent__ is root['a']['b'], sm.__name__
+      (True, '++etc++site')
+      >>> list(sm.keys())
+      [u'default']
+      >>> root['a']['c'].getSiteManager().__bases__ == sm.__bases__
+      True
+
+      >>> sms = makeSites(possibleSites(root))
+      >>> len(sms)
+      2
+      >>> root['d'].getSiteManager().__bases__ == (
+      ...     root.getSiteManager(), )
+      True
+      >>> makeSites(possibleSites(root))
+      []
+
+    If `chunk` is given, the transaction is committed every `chunk` sites.
+    """
+    nexts = {}
+    made = []
+    for folder in folders:
+        if ISite.providedBy(folder):
+            continue
+        # We don't want to store security proxies, see `MakeSite`
+        bare = removeSecurityProxy(folder)
+        parent = getattr(bare, '__parent__', None)
+        if (parent is None or IRoot.providedBy(bare)
+            or ISite.providedBy(parent)):
+            # The next site manager is found right away
+            sm = LocalSiteManager(bare)
+        else:
+            next = nexts.get(parent)
+            if next is None:
+                next = nexts[parent] = _nextSiteManager(bare)
+            sm = _newSiteManager(bare, next)
+        folder.setSiteManager(sm)
+        made.append(sm)
+        if chunk and not len(made) % chunk:
+            transaction.commit()
+    return made
@@ -0,0 +1,253 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Support for caches derived from component registries
+
+Every adapter registry keeps a ``_generation`` counter that is incremented
+whenever a registration is added to or removed from it.  Data computed from
+a registry can be stamped with these counters and thrown away as soon as
+they move.  The caches are kept in volatile attributes of the site managers,
+so they are never stored in the database.
+"""
+__docformat__ = 'restructuredtext'
+
+import zope.component
+from zope.interface import Interface, providedBy
+
+
+def localGeneration(sm):
+    """Return the generations of the registries of the site manager `sm`.
+
+    Unlike `generation`, this doesn't look at the base registries.  A
+    registry moves its generation when its own registrations change, but
+    also when a base registry tells it about a change, so changes in base
+    registries are reflected as well:
+
+      >>> from zope.interface import Interface
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> from zope.component.registry import Components
+      >>> base = Components('base')
+      >>> sm = Components('sm', (base, ))
+      >>> before = localGeneration(sm)
+
+      >>> base.registerUtility(object(), IObject)
+      >>> localGeneration(sm) == before
+      False
+
+      >>> before = localGeneration(sm)
+      >>> sm.registerUtility(object(), IObject)
+      >>> localGeneration(sm) == before
+      False
+
+    Objects that do not have registries, like site manager stubs, always
+    have the same generation:
+
+      >>> localGeneration(object())
+      (None, None)
+
+    """
+    return (getattr(getattr(sm, 'utilities', None), '_generation', None),
+            getattr(getattr(sm, 'adapters', None), '_generation', None))
+
+
+def generation(registry):
+    """Return the generations of an adapter registry and all its bases.
+
+    This is what verifying registries use to check their own lookup caches,
+    it changes whenever a lookup in `registry` may give a different result:
+
+      >>> from zope.interface import Interface
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> from zope.component.registry import Components
+      >>> base = Components('base')
+      >>> sm = Components('sm', (base, ))
+      >>> before = generation(sm.utilities)
+
+      >>> base.registerUtility(object(), IObject)
+      >>> generation(sm.utilities) == before
+      False
+
+    """
+    return tuple([r._generation for r in registry.ro])
+
+
+class GenerationCache(object):
+    """A cache that is emptied when a registry generation changes.
+
+      >>> cache = GenerationCache()
+      >>> cache.validate((1, ))
+      >>> cache.get('key') is None
+      True
+      >>> cache['key'] = 42
+      >>> cache.get('key')
+      42
+      >>> cache.validate((1, ))
+      >>> cache.get('key')
+      42
+      >>> cache.validate((2, ))
+      >>> cache.get('key') is None
+      True
+
+    The cache counts hits and misses:
+
+      >>> sorted(cache.statistics().items())
+      [('hits', 2), ('misses', 2), ('size', 0)]
+
+    """
+
+    generation = None
+
+    def __init__(self):
+        self.hits = self.misses = 0
+        self._data = {}
+
+    def validate(self, generation):
+        """Empty the cache unless it was filled for `generation`."""
+        if generation != self.generation:
+            self._data.clear()
+            self.generation = generation
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def statistics(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._data)}
+
+
+_CACHES = '_v_zope_app_component_caches'
+
+def getCache(sm, name, generation):
+    """Return the cache called `name` of the site manager `sm`.
+
+    The cache is kept in a volatile attribute of the site manager and is
+    emptied if it wasn't filled for `generation`:
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> cache = getCache(sm, 'test', (1, ))
+      >>> cache['key'] = 42
+      >>> getCache(sm, 'test', (1, )) is cache
+      True
+      >>> getCache(sm, 'test', (1, )).get('key')
+      42
+      >>> getCache(sm, 'test', (2, )).get('key') is None
+      True
+
+    """
+    caches = getattr(sm, _CACHES, None)
+    if caches is None:
+        caches = {}
+        setattr(sm, _CACHES, caches)
+    cache = caches.get(name)
+    if cache is None:
+        cache = caches[name] = GenerationCache()
+    cache.validate(generation)
+    return cache
+
+
+def cacheStatistics(sm):
+    """Return the hit and miss counts of the caches of the site manager `sm`.
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> cacheStatistics(sm)
+      {}
+      >>> getCache(sm, 'test', (1, )).get('key')
+      >>> sorted(cacheStatistics(sm)['test'].items())
+      [('hits', 0), ('misses', 1), ('size', 0)]
+
+    """
+    caches = getattr(sm, _CACHES, None) or {}
+    return dict([(name, cache.statistics())
+                 for name, cache in caches.items()])
+
+
+def _clearGlobalCaches():
+    # The global site manager survives a test clean-up, but its registries
+    # are replaced, so what we derived from them has to go.
+    gsm = zope.component.getGlobalSiteManager()
+    for name in list(vars(gsm)):
+        if name.startswith('_v_zope_app_component_'):
+            delattr(gsm, name)
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:
+    pass
+else:
+    addCleanUp(_clearGlobalCaches)
+
+
+_missing = object()
+
+def queryMultiAdapter(objects, interface=Interface, name=u'', default=None):
+    """Look for a multi-adapter, remembering the lookups that fail.
+
+    This is `zope.component.queryMultiAdapter` for the current site
+    manager.  When no adapter is found, this is remembered for the
+    interfaces provided by the objects and the name until an adapter
+    registry of the site manager or its bases changes:
+
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> sm = zope.component.getSiteManager()
+      >>> objects = (object(), object())
+      >>> queryMultiAdapter(objects, name=u'view') is None
+      True
+      >>> queryMultiAdapter(objects, name=u'view', default=42)
+      42
+      >>> sorted(cacheStatistics(sm)['queryMultiAdapter'].items())
+      [('hits', 1), ('misses', 1), ('size', 1)]
+
+    Registering an adapter makes the lookup succeed:
+
+      >>> def view(first, second):
+      ...     return 'view'
+      >>> sm.registerAdapter(view, (None, None), Interface, u'view')
+      >>> queryMultiAdapter(objects, name=u'view')
+      'view'
+
+    """
+    sm = zope.component.getSiteManager()
+    adapters = getattr(sm, 'adapters', None)
+    if adapters is None:
+        return sm.queryMultiAdapter(objects, interface, name, default)
+
+    cache = getCache(sm, 'queryMultiAdapter', generation(adapters))
+    specs = tuple([providedBy(o) for o in objects])
+    key = specs, interface, name
+    if cache.get(key) is _missing:
+        return default
+    factory = adapters.lookup(specs, interface, name)
+    if factory is None:
+        cache[key] = _missing
+        return default
+    adapter = factory(*objects)
+    if adapter is None:
+        return default
+    return adapter
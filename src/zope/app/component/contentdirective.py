@@ -15,5 +15,8 @@
 `zope.security.metaconfigure`.
 """
 
+import zope.deferredimport
+
 # BBB
-from zope.security.metaconfigure import ClassDirective
+zope.deferredimport.defineFrom('zope.security.metaconfigure',
+                               'ClassDirective')
@@ -0,0 +1,259 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Where the current site is kept
+
+`zope.component.hooks` keeps the current site in the thread local
+`zope.component.hooks.siteinfo`, so a request has to be processed in a
+single thread from start to end.  `install` replaces it with another
+storage: any object with the ``site``, ``sm`` and ``adapter_hook``
+attributes of the thread local, like one kept per greenlet.  Call it at
+startup, after the hooks were set up with `zope.component.hooks.setHooks`;
+`uninstall` puts the thread local back.  `setSite`, `getSite` and the hooks
+of `zope.component.hooks` keep working with any storage.
+
+By default `install` keeps the site in a ``contextvars`` context variable,
+which follows asyncio tasks and the contexts copied into the threads of a
+thread pool.  The `getSiteManager` and `adapter_hook` hooks installed with
+it read the context variable only once per call.  Context variables are
+only available from Python 3.7 on; `CONTEXTVARS_SUPPORT` tells whether
+they can be used.
+"""
+__docformat__ = 'restructuredtext'
+
+try:
+    import contextvars
+except ImportError:
+    CONTEXTVARS_SUPPORT = False
+else:
+    CONTEXTVARS_SUPPORT = True
+
+import zope.component
+import zope.component.hooks
+from zope.component.interfaces import ComponentLookupError
+
+try:
+    from zope.security.proxy import removeSecurityProxy
+except ImportError:
+    removeSecurityProxy = None
+
+
+class _State(object):
+    """The site and site manager of a context
+
+    States are never changed once they are set, as they are shared by the
+    contexts copied from the one they were set in.  Only the adapter hook
+    is filled in on first use.
+    """
+    __slots__ = ('site', 'sm', 'hook')
+
+    def __init__(self, site, sm):
+        self.site = site
+        self.sm = sm
+        self.hook = None
+
+
+if CONTEXTVARS_SUPPORT:
+    _site = contextvars.ContextVar(
+        'zope.app.component.site',
+        default=_State(None, zope.component.getGlobalSiteManager()))
+
+
+class ContextSiteInfo(object):
+    """The current site and site manager, kept in a context variable
+
+    This has the attributes of the thread local `zope.component.hooks.siteinfo`.
+    """
+
+    def site(self):
+        return _site.get().site
+
+    def _setSite(self, site):
+        _site.set(_State(site, _site.get().sm))
+
+    site = property(site, _setSite)
+
+    def sm(self):
+        return _site.get().sm
+
+    def _setSM(self, sm):
+        _site.set(_State(_site.get().site, sm))
+
+    sm = property(sm, _setSM)
+
+    def adapter_hook(self):
+        state = _site.get()
+        hook = state.hook
+        if hook is None:
+            hook = state.hook = state.sm.adapters.adapter_hook
+        return hook
+
+    def _resetAdapterHook(self):
+        state = _site.get()
+        _site.set(_State(state.site, state.sm))
+
+    adapter_hook = property(adapter_hook, None, _resetAdapterHook)
+
+
+siteinfo = ContextSiteInfo()
+
+
+def setSite(site=None):
+    """Make `site` the current site of the context."""
+    if site is None:
+        sm = zope.component.getGlobalSiteManager()
+    else:
+        if removeSecurityProxy is not None:
+            site = removeSecurityProxy(site)
+        sm = site.getSiteManager()
+    _site.set(_State(site, sm))
+
+
+def getSite():
+    return _site.get().site
+
+
+def getSiteManager(context=None):
+    if context is None:
+        return _site.get().sm
+    return zope.component.hooks.getSiteManager(context)
+
+
+def adapter_hook(interface, object, name='', default=None):
+    state = _site.get()
+    hook = state.hook
+    if hook is None:
+        hook = state.hook = state.sm.adapters.adapter_hook
+    try:
+        return hook(interface, object, name, default)
+    except ComponentLookupError:
+        return default
+
+
+# The site information and hooks that were in place when the storage was
+# installed
+_installed = None
+
+def install(storage=None):
+    """Keep the current site in `storage`.
+
+    The storage takes over the current site:
+
+      >>> from zope.component.hooks import setHooks, SiteInfo
+      >>> from zope.component.registry import Components
+      >>> setHooks()
+      >>> class Site(object):
+      ...     def getSiteManager(self):
+      ...         return sm
+      >>> sm = Components('site')
+      >>> site = Site()
+      >>> zope.component.hooks.setSite(site)
+
+      >>> storage = SiteInfo()
+      >>> install(storage)
+      >>> installed()
+      True
+      >>> zope.component.hooks.siteinfo is storage
+      True
+      >>> storage.site is site
+      True
+      >>> zope.component.getSiteManager() is sm
+      True
+
+    The site is then set and looked up there:
+
+      >>> zope.component.hooks.setSite()
+      >>> storage.site is None
+      True
+      >>> zope.component.getSiteManager() is sm
+      False
+      >>> zope.component.hooks.setSite(site)
+
+    `uninstall` keeps the current site in the thread local again:
+
+      >>> uninstall()
+      >>> installed()
+      False
+      >>> zope.component.hooks.siteinfo is storage
+      False
+      >>> zope.component.hooks.getSite() is site
+      True
+      >>> zope.component.hooks.setSite()
+
+    Without a storage, the site is kept in a context variable, which needs
+    Python 3.7 or later.
+    """
+    global _installed
+    if _installed is not None:
+        uninstall()
+    if storage is None:
+        if not CONTEXTVARS_SUPPORT:
+            raise ImportError("Context variables need Python 3.7 or later")
+        storage = siteinfo
+        hooks = adapter_hook, getSiteManager
+    else:
+        hooks = (zope.component.hooks.adapter_hook,
+                 zope.component.hooks.getSiteManager)
+    previous = zope.component.hooks.siteinfo
+    _moveSite(previous, storage)
+    _installed = (previous, hooks,
+                  zope.component.adapter_hook.sethook(hooks[0]),
+                  zope.component.getSiteManager.sethook(hooks[1]))
+    _setSiteInfo(storage)
+
+
+def uninstall():
+    """Keep the current site in the thread local of `zope.component.hooks`.
+    """
+    global _installed
+    if _installed is None:
+        return
+    previous, hooks, hooked_adapter_hook, hooked_getSiteManager = _installed
+    _installed = None
+    storage = zope.component.hooks.siteinfo
+    _moveSite(storage, previous)
+    _setSiteInfo(previous)
+    # Hooks set on top of ours, like the instrumented ones, are kept
+    if zope.component.adapter_hook.implementation is hooks[0]:
+        zope.component.adapter_hook.sethook(hooked_adapter_hook)
+    if zope.component.getSiteManager.implementation is hooks[1]:
+        zope.component.getSiteManager.sethook(hooked_getSiteManager)
+    _moveSite(_State(None, zope.component.getGlobalSiteManager()), storage)
+
+
+def _setSiteInfo(storage):
+    import zope.app.component.hooks
+    zope.component.hooks.siteinfo = storage
+    zope.app.component.hooks.siteinfo = storage
+
+
+def _moveSite(source, storage):
+    storage.site = source.site
+    storage.sm = source.sm
+    try:
+        del storage.adapter_hook
+    except AttributeError:
+        pass
+
+
+def installed():
+    """Tell whether the current site is kept in another storage."""
+    return _installed is not None
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:
+    pass
+else:
+    addCleanUp(uninstall)
@@ -17,15 +17,17 @@ The real public API is now zope.component.hooks
 """
 __docformat__ = 'restructuredtext'
 
-from zope.component.hooks import (
-                             read_property,
-                             SiteInfo,
-                             siteinfo,
-                             setSite,
-                             getSite,
-                             getSiteManager,
-                             adapter_hook,
-                             setHooks,
-                             resetHooks,
-                             setSite,
-                             clearSite) # BBB
+import zope.deferredimport
+
+# BBB
+zope.deferredimport.defineFrom('zope.component.hooks',
+                               'read_property',
+                               'SiteInfo',
+                               'siteinfo',
+                               'setSite',
+                               'getSite',
+                               'getSiteManager',
+                               'adapter_hook',
+                               'setHooks',
+                               'resetHooks',
+                               'clearSite')
@@ -0,0 +1,312 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Reverse index from components to their registrations
+
+Finding the registrations of a single component would otherwise require
+scanning every registration of a site manager.  The index is kept in a
+volatile attribute of the site manager, so it is never stored in the
+database; it is built on first use and kept up to date by the
+registration events.
+
+The index also keeps the sort key of every registration, so that the
+registration views don't compare registration objects to sort them.
+"""
+__docformat__ = 'restructuredtext'
+
+import operator
+
+import zope.component
+from zope.component.interfaces import IRegistered, IUnregistered
+from zope.component.interfaces import IUtilityRegistration
+from zope.security.proxy import removeSecurityProxy
+
+from zope.app.component.cache import localGeneration
+
+_INDEX = '_v_zope_app_component_registrationIndex'
+
+_containers = ('_utility_registrations', '_adapter_registrations',
+               '_subscription_registrations', '_handler_registrations')
+
+
+def _registered(registration):
+    """Return the object a registration is about."""
+    if IUtilityRegistration.providedBy(registration):
+        return registration.component
+    return registration.factory
+
+
+def dottedName(spec):
+    """Return the dotted name of an interface, or '' for ``None``"""
+    if spec is None:
+        return ''
+    return getattr(spec, '__identifier__', None) or spec.__name__
+
+
+def sortKey(registration):
+    """Return the key the registration views sort registrations by
+
+    It orders the registrations by kind, provided interface, required
+    interfaces, name and factory:
+
+      >>> from zope.interface import Interface
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> sm.registerUtility(object(), Interface, u'one')
+      >>> [registration] = sm.registeredUtilities()
+      >>> sortKey(registration)
+      ('UtilityRegistration', 'zope.interface.Interface', (), u'one', '')
+
+    The key is not unique, a factory can be subscribed or registered as a
+    handler more than once.  The comment of the registration is left out,
+    as the keys end up in the cursors of the registration views.
+    """
+    factory = getattr(registration, 'factory', None)
+    return (registration.__class__.__name__,
+            dottedName(registration.provided),
+            tuple([dottedName(r)
+                   for r in getattr(registration, 'required', ())]),
+            registration.name,
+            getattr(factory, '__name__', ''),
+            )
+
+
+def _key(registration):
+    """Return what the registry uses to tell registrations apart."""
+    return (registration.__class__,
+            getattr(registration, 'required', None),
+            registration.provided,
+            registration.name)
+
+
+def _serials(sm):
+    # Registrations committed by other processes show up as new serials of
+    # the registration containers; our own changes are covered by events.
+    serials = []
+    for name in _containers:
+        container = getattr(sm, name, None)
+        activate = getattr(container, '_p_activate', None)
+        if activate is not None:
+            activate()
+        serials.append(getattr(container, '_p_serial', None))
+    return tuple(serials)
+
+
+def registrationStamp(sm):
+    """Return a value that changes whenever the registrations of `sm` do.
+
+      >>> from zope.interface import Interface
+      >>> from zope.component.registry import Components
+      >>> base = Components('base')
+      >>> sm = Components('sm', (base, ))
+      >>> stamp = registrationStamp(sm)
+      >>> registrationStamp(sm) == stamp
+      True
+      >>> sm.registerUtility(object(), Interface)
+      >>> registrationStamp(sm) == stamp
+      False
+
+    It is made of the generations of the registries of `sm`, which base
+    registries move as well when they change:
+
+      >>> stamp = registrationStamp(sm)
+      >>> base.registerUtility(object(), Interface)
+      >>> registrationStamp(sm) == stamp
+      False
+
+    """
+    return localGeneration(sm), _serials(sm)
+
+
+_first = operator.itemgetter(0)
+
+class RegistrationIndex(object):
+    """Registrations of a site manager, keyed by component identity."""
+
+    def __init__(self, sm):
+        self.stamp = registrationStamp(sm)
+        # id(component) -> [(sort key, registration)]
+        self._components = {}
+        # sort key -> the number telling the next registration with the key
+        # apart from the ones before it
+        self._numbers = {}
+        self._sorted = None
+        for registrations in (sm.registeredUtilities(),
+                              sm.registeredAdapters(),
+                              sm.registeredSubscriptionAdapters(),
+                              sm.registeredHandlers()):
+            for registration in registrations:
+                self.add(registration)
+
+    def add(self, registration):
+        key = sortKey(registration)
+        number = self._numbers.get(key, 0)
+        self._numbers[key] = number + 1
+        self._components.setdefault(
+            id(_registered(registration)), []).append(
+            (key + (number, ), registration))
+        self._sorted = None
+
+    def remove(self, registration):
+        oid = id(_registered(registration))
+        key = _key(registration)
+        registrations = [(k, r) for k, r in self._components.get(oid, ())
+                         if _key(r) != key]
+        if registrations:
+            self._components[oid] = registrations
+        else:
+            self._components.pop(oid, None)
+        self._sorted = None
+
+    def registrations(self, component):
+        """Return the registrations of `component`."""
+        return [r for k, r in self._components.get(
+                    id(removeSecurityProxy(component)), ())]
+
+    def sorted(self, component=None):
+        """Return the sort keys and the registrations, sorted by key.
+
+        The keys are the `sortKey` of the registrations, followed by a
+        number that tells registrations with the same key apart, in the
+        order they were registered in.  Only the registrations of `component` are returned if it is given.
+        The order of all registrations is kept until they change, the
+        returned lists must not be modified.
+        """
+        if component is not None:
+            pairs = sorted(self._components.get(
+                id(removeSecurityProxy(component)), ()), key=_first)
+            return [k for k, r in pairs], [r for k, r in pairs]
+        if self._sorted is None:
+            pairs = []
+            for registrations in self._components.values():
+                pairs.extend(registrations)
+            pairs.sort(key=_first)
+            self._sorted = [k for k, r in pairs], [r for k, r in pairs]
+        return self._sorted
+
+
+def getRegistrationIndex(sm):
+    """Return an up-to-date registration index for the site manager `sm`.
+
+      >>> from zope.interface import Interface
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> one, two = object(), object()
+      >>> sm.registerUtility(one, IObject, 'one')
+      >>> sm.registerUtility(one, IObject, 'uno')
+
+      >>> index = getRegistrationIndex(sm)
+      >>> sorted([r.name for r in index.registrations(one)])
+      ['one', 'uno']
+      >>> index.registrations(two)
+      []
+
+    The registrations can be had sorted by their sort keys:
+
+      >>> keys, registrations = index.sorted()
+      >>> [r.name for r in registrations]
+      ['one', 'uno']
+      >>> keys == [sortKey(r) + (0, ) for r in registrations]
+      True
+
+    The index is reused as long as the registrations don't change:
+
+      >>> getRegistrationIndex(sm) is index
+      True
+
+    Registration events update the index in place:
+
+      >>> zope.component.provideHandler(registrationAdded)
+      >>> zope.component.provideHandler(registrationRemoved)
+
+      >>> sm.registerUtility(two, IObject, 'two')
+      >>> sm.unregisterUtility(one, IObject, 'uno')
+      True
+      >>> getRegistrationIndex(sm) is index
+      True
+      >>> [r.name for r in index.registrations(one)]
+      ['one']
+      >>> [r.name for r in index.registrations(two)]
+      ['two']
+
+    Changes that don't send events cause the index to be rebuilt:
+
+      >>> sm.registerUtility(two, IObject, 'deux', event=False)
+      >>> index = getRegistrationIndex(sm)
+      >>> sorted([r.name for r in index.registrations(two)])
+      ['deux', 'two']
+
+    Registrations that have the same sort key get different keys in the
+    index:
+
+      >>> def handler(event):
+      ...     pass
+      >>> sm.registerHandler(handler, (IObject, ))
+      >>> sm.registerHandler(handler, (IObject, ))
+      >>> keys, registrations = getRegistrationIndex(sm).sorted()
+      >>> [key[-1] for key in keys[:2]]
+      [0, 1]
+      >>> sm.unregisterHandler(handler, (IObject, ))
+      True
+
+    """
+    index = getattr(sm, _INDEX, None)
+    if index is None or index.stamp != registrationStamp(sm):
+        index = RegistrationIndex(sm)
+        setattr(sm, _INDEX, index)
+    return index
+
+
+def invalidateRegistrationIndex(sm):
+    """Throw away the registration index of the site manager `sm`.
+
+    This is meant for code that changes many registrations at once without
+    sending events for each of them as it goes.
+    """
+    if getattr(sm, _INDEX, None) is not None:
+        delattr(sm, _INDEX)
+
+
+def _update(registration, apply):
+    sm = registration.registry
+    index = getattr(sm, _INDEX, None)
+    if index is None:
+        return
+    generation, serials = index.stamp
+    current = localGeneration(sm)
+    # A single registration or unregistration moves the generation of one
+    # registry by one or two.  Anything else means that the index missed a
+    # change or that a base registry changed, so we drop it and let it be
+    # rebuilt when it is needed next.
+    if (_registered(registration) is not None
+        and serials == _serials(sm)
+        and 0 < sum(current) - sum(generation) <= 2):
+        apply(index, registration)
+        index.stamp = current, serials
+    else:
+        invalidateRegistrationIndex(sm)
+
+
+@zope.component.adapter(IRegistered)
+def registrationAdded(event):
+    """Add a new registration to the index of its site manager."""
+    _update(event.object, RegistrationIndex.add)
+
+
+@zope.component.adapter(IUnregistered)
+def registrationRemoved(event):
+    """Remove a registration from the index of its site manager."""
+    _update(event.object, RegistrationIndex.remove)
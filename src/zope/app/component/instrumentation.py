@@ -0,0 +1,316 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Statistics about component lookups
+
+`enable` wraps the `adapter_hook` and `getSiteManager` hooks of
+`zope.component` (normally the ones of `zope.component.hooks`) to count the
+calls and the adapter lookups that found nothing, per current site manager,
+and to collect a histogram of their latencies.  The current site manager is
+the one the lookup started from, the registry that had the adapter may be
+one of its bases.  `disable`
+puts the original hooks back, so nothing is measured, and nothing costs
+anything, unless instrumentation was enabled.
+
+The numbers are collected per thread.  `collect` adds the numbers of the
+current thread to the process totals and starts over; it is called at the
+end of every request, so `currentStatistics` describes the lookups of the
+request being processed.
+"""
+__docformat__ = 'restructuredtext'
+
+import bisect
+import threading
+import timeit
+
+import zope.component
+import zope.component.hooks
+from zope.publisher.interfaces import IEndRequestEvent
+
+# Upper bounds of the latency histogram buckets, in seconds; the last
+# bucket counts everything slower
+BOUNDS = (1e-6, 2e-6, 5e-6, 1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3)
+
+_timer = timeit.default_timer
+
+
+def _label(sm):
+    if sm is zope.component.getGlobalSiteManager():
+        return 'global'
+    try:
+        from zope.traversing.api import getPath
+        return getPath(sm)
+    except Exception:
+        return getattr(sm, '__name__', None) or repr(sm)
+
+
+class LookupStatistics(object):
+    """Numbers about the component lookups of a thread or process.
+
+      >>> stats = LookupStatistics()
+      >>> stats.adapterLookup(None, 3e-6, False)
+      >>> stats.adapterLookup(None, 3e-3, True)
+      >>> stats.siteManagerLookup(1e-6)
+
+      >>> report = stats.report()
+      >>> report['adapter_hook']['calls'], report['adapter_hook']['misses']
+      (2, 1)
+      >>> report['adapter_hook']['histogram'][5e-6]
+      1
+      >>> report['adapter_hook']['histogram'][None]
+      1
+      >>> report['getSiteManager']['calls']
+      1
+
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.adapterCalls = self.adapterMisses = self.siteManagerCalls = 0
+        self.adapterTime = self.siteManagerTime = 0.0
+        self.adapterHistogram = [0] * (len(BOUNDS) + 1)
+        self.siteManagerHistogram = [0] * (len(BOUNDS) + 1)
+        # id(current site manager) -> [label, lookups, misses], merged
+        # statistics are kept by label instead
+        self.siteManagers = {}
+
+    def adapterLookup(self, sm, elapsed, miss):
+        self.adapterCalls += 1
+        self.adapterTime += elapsed
+        self.adapterHistogram[bisect.bisect_left(BOUNDS, elapsed)] += 1
+        counts = self.siteManagers.get(id(sm))
+        if counts is None:
+            counts = self.siteManagers[id(sm)] = [_label(sm), 0, 0]
+        counts[1] += 1
+        if miss:
+            self.adapterMisses += 1
+            counts[2] += 1
+
+    def siteManagerLookup(self, elapsed):
+        self.siteManagerCalls += 1
+        self.siteManagerTime += elapsed
+        self.siteManagerHistogram[bisect.bisect_left(BOUNDS, elapsed)] += 1
+
+    def merge(self, other):
+        """Add the numbers of the statistics `other` to these."""
+        self.adapterCalls += other.adapterCalls
+        self.adapterMisses += other.adapterMisses
+        self.adapterTime += other.adapterTime
+        self.siteManagerCalls += other.siteManagerCalls
+        self.siteManagerTime += other.siteManagerTime
+        for i, count in enumerate(other.adapterHistogram):
+            self.adapterHistogram[i] += count
+        for i, count in enumerate(other.siteManagerHistogram):
+            self.siteManagerHistogram[i] += count
+        # Ids of site managers may be reused once they are gone, so the
+        # merged numbers are kept by label
+        for label, lookups, misses in other.siteManagers.values():
+            counts = self.siteManagers.get(label)
+            if counts is None:
+                counts = self.siteManagers[label] = [label, 0, 0]
+            counts[1] += lookups
+            counts[2] += misses
+
+    def report(self):
+        """Return the numbers as a dictionary.
+
+        The histograms map the upper bound of each bucket to the number of
+        calls that took at most that long; ``None`` stands for the calls
+        that were slower than the largest bound.
+        """
+        bounds = BOUNDS + (None, )
+        sites = {}
+        for label, lookups, misses in self.siteManagers.values():
+            entry = sites.setdefault(label, {'lookups': 0, 'misses': 0})
+            entry['lookups'] += lookups
+            entry['misses'] += misses
+        return {
+            'adapter_hook': {
+                'calls': self.adapterCalls,
+                'misses': self.adapterMisses,
+                'time': self.adapterTime,
+                'histogram': dict(zip(bounds, self.adapterHistogram)),
+                'current_site_managers': sites,
+                },
+            'getSiteManager': {
+                'calls': self.siteManagerCalls,
+                'time': self.siteManagerTime,
+                'histogram': dict(zip(bounds, self.siteManagerHistogram)),
+                },
+            }
+
+
+class _Current(threading.local):
+    statistics = None
+
+_current = _Current()
+_totals = LookupStatistics()
+_lock = threading.Lock()
+
+# The hooks that were in place when instrumentation was enabled and the
+# ones that replaced them
+_hooks = None
+
+
+def currentStatistics():
+    """Return the statistics of the current thread since the last `collect`.
+    """
+    statistics = _current.statistics
+    if statistics is None:
+        statistics = _current.statistics = LookupStatistics()
+    return statistics
+
+
+def collect():
+    """Add the statistics of the current thread to the process totals.
+
+    The statistics of the current thread are returned and started over.
+    """
+    statistics = _current.statistics
+    if statistics is None:
+        return None
+    _current.statistics = None
+    _lock.acquire()
+    try:
+        _totals.merge(statistics)
+    finally:
+        _lock.release()
+    return statistics
+
+
+def statistics():
+    """Return a report of the collected statistics of all threads."""
+    _lock.acquire()
+    try:
+        return _totals.report()
+    finally:
+        _lock.release()
+
+
+def resetStatistics():
+    """Throw away the collected statistics."""
+    _current.statistics = None
+    _lock.acquire()
+    try:
+        _totals.reset()
+    finally:
+        _lock.release()
+
+
+def enable():
+    """Start measuring the component lookups.
+
+      >>> from zope.component.hooks import setHooks, resetHooks
+      >>> setHooks()
+      >>> resetStatistics()
+      >>> enable()
+      >>> enabled()
+      True
+
+      >>> from zope.interface import Interface
+      >>> class IMissing(Interface):
+      ...     pass
+      >>> IMissing(object(), None) is None
+      True
+      >>> sm = zope.component.getSiteManager()
+
+      >>> disable()
+      >>> enabled()
+      False
+      >>> IMissing(object(), None) is None
+      True
+
+      >>> stats = collect()
+      >>> stats.adapterCalls, stats.adapterMisses, stats.siteManagerCalls
+      (1, 1, 1)
+      >>> report = statistics()['adapter_hook']
+      >>> sorted(report['current_site_managers']['global'].items())
+      [('lookups', 1), ('misses', 1)]
+
+    Lookups that are still running in other threads when the hooks are put
+    back keep working:
+
+      >>> enable()
+      >>> hook = zope.component.adapter_hook.implementation
+      >>> disable()
+      >>> hook(IMissing, object()) is None
+      True
+
+      >>> resetStatistics()
+      >>> resetHooks()
+
+    """
+    global _hooks
+    if _hooks is not None:
+        return
+    hooked_adapter_hook = zope.component.adapter_hook.implementation
+    hooked_getSiteManager = zope.component.getSiteManager.implementation
+    adapter_hook, getSiteManager = _instrument(hooked_adapter_hook,
+                                               hooked_getSiteManager)
+    zope.component.adapter_hook.sethook(adapter_hook)
+    zope.component.getSiteManager.sethook(getSiteManager)
+    _hooks = (hooked_adapter_hook, hooked_getSiteManager,
+              adapter_hook, getSiteManager)
+
+
+def disable():
+    """Stop measuring the component lookups and restore the hooks."""
+    global _hooks
+    hooks = _hooks
+    if hooks is None:
+        return
+    hooked_adapter_hook, hooked_getSiteManager = hooks[:2]
+    adapter_hook, getSiteManager = hooks[2:]
+    if zope.component.adapter_hook.implementation is adapter_hook:
+        zope.component.adapter_hook.sethook(hooked_adapter_hook)
+    if zope.component.getSiteManager.implementation is getSiteManager:
+        zope.component.getSiteManager.sethook(hooked_getSiteManager)
+    _hooks = None
+
+
+def enabled():
+    """Tell whether the component lookups are measured."""
+    hooks = _hooks
+    return (hooks is not None
+            and zope.component.adapter_hook.implementation is hooks[2])
+
+
+def _instrument(hooked_adapter_hook, hooked_getSiteManager):
+    # Return hooks measuring the calls of the ones they replace.  They keep
+    # these themselves, so that lookups that are running while the hooks
+    # are put back still work.
+
+    def adapter_hook(interface, object, name='', default=None):
+        start = _timer()
+        result = hooked_adapter_hook(interface, object, name, default)
+        elapsed = _timer() - start
+        currentStatistics().adapterLookup(zope.component.hooks.siteinfo.sm,
+                                          elapsed, result is default)
+        return result
+
+    def getSiteManager(context=None):
+        start = _timer()
+        result = hooked_getSiteManager(context)
+        currentStatistics().siteManagerLookup(_timer() - start)
+        return result
+
+    return adapter_hook, getSiteManager
+
+
+@zope.component.adapter(IEndRequestEvent)
+def requestEnded(event):
+    """Collect the statistics of a request when it ends."""
+    if _current.statistics is not None:
+        collect()
@@ -0,0 +1,295 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Index of the interfaces registered as utilities
+
+The interface search functions of `zope.component.interface` go through all
+registered interfaces on every call, and `interfaceToName` does a search
+for every interface it is asked about.  The index in this module keeps the
+registered interfaces by name and by the interfaces they extend, so these
+searches only cost as much as their result.  `interfaceToName` here doesn't
+search at all, as the name it finds is the dotted name of the interface.
+
+Like the registration index, it is kept in a volatile attribute of the
+site manager and maintained by the registration events.
+"""
+__docformat__ = 'restructuredtext'
+
+import zope.component
+from zope.component.interface import getInterfaceAllDocs
+from zope.component.interfaces import IRegistered, IUnregistered
+from zope.component.interfaces import IUtilityRegistration
+from zope.interface.interfaces import IInterface
+
+_INDEX = '_v_zope_app_component_interfaceIndex'
+
+
+def _typeOrder(type):
+    # The more specific interface types come first
+    return -len(type.__iro__), type.__module__ + '.' + type.__name__
+
+
+class InterfaceIndex(object):
+    """Interfaces registered in a site manager, by name and by base."""
+
+    def __init__(self, sm):
+        self.registry = sm.utilities
+        self.generation = sm.utilities._generation
+        # name -> {provided: interface}, an interface may be registered
+        # under the same name for several interface types
+        self._names = {}
+        # base -> {name: interface} for the interfaces extending base
+        self._bases = {}
+        for registration in sm.registeredUtilities():
+            if registration.provided.isOrExtends(IInterface):
+                self.add(registration)
+
+    def get(self, name, default=None):
+        """Return the interface registered under `name`.
+
+        If there are several, the one registered for the most specific
+        interface type is returned:
+
+          >>> from zope.interface import Interface
+          >>> class IKind(IInterface):
+          ...     pass
+          >>> class IOne(Interface):
+          ...     pass
+          >>> class ITwo(Interface):
+          ...     pass
+
+          >>> from zope.component.registry import Components
+          >>> sm = Components()
+          >>> sm.registerUtility(IOne, IInterface, 'shared')
+          >>> sm.registerUtility(ITwo, IKind, 'shared')
+          >>> InterfaceIndex(sm).get('shared')
+          <InterfaceClass zope.app.component.interfaceindex.ITwo>
+
+          >>> sm = Components()
+          >>> sm.registerUtility(IOne, IKind, 'shared')
+          >>> sm.registerUtility(ITwo, IInterface, 'shared')
+          >>> InterfaceIndex(sm).get('shared')
+          <InterfaceClass zope.app.component.interfaceindex.IOne>
+
+        Types that are equally specific are ordered by their dotted names.
+        """
+        provided = self._names.get(name)
+        if not provided:
+            return default
+        return provided[min(provided, key=_typeOrder)]
+
+    def add(self, registration):
+        name = registration.name
+        old = self.get(name)
+        self._names.setdefault(name, {})[registration.provided] = (
+            registration.component)
+        self._reindex(name, old)
+
+    def remove(self, registration):
+        name = registration.name
+        old = self.get(name)
+        provided = self._names.get(name, {})
+        provided.pop(registration.provided, None)
+        if not provided:
+            self._names.pop(name, None)
+        self._reindex(name, old)
+
+    def _reindex(self, name, old):
+        new = self.get(name)
+        if new is old:
+            return
+        if old is not None:
+            for base in old.__iro__:
+                extending = self._bases[base]
+                del extending[name]
+                if not extending:
+                    del self._bases[base]
+        if new is not None:
+            for base in new.__iro__:
+                self._bases.setdefault(base, {})[name] = new
+
+    def items(self, base=None):
+        """Return ``(name, interface)`` pairs of the registered interfaces.
+
+        If `base` is given, only `base` and the interfaces extending it are
+        returned, like `zope.component.interface.searchInterface` does.
+        """
+        if base is None:
+            return [(name, self.get(name)) for name in self._names]
+        return list(self._bases.get(base, {}).items())
+
+
+def getInterfaceIndex(sm=None):
+    """Return an up-to-date interface index of the site manager `sm`.
+
+    The global site manager is used by default, like the interface search
+    functions do:
+
+      >>> from zope.interface import Interface
+      >>> from zope.interface.interfaces import IInterface
+      >>> class IBase(Interface):
+      ...     pass
+      >>> class IDerived(IBase):
+      ...     pass
+
+      >>> from zope.component.interface import provideInterface
+      >>> provideInterface('', IBase)
+      >>> provideInterface('derived', IDerived)
+
+      >>> index = getInterfaceIndex()
+      >>> index.get('derived')
+      <InterfaceClass zope.app.component.interfaceindex.IDerived>
+      >>> sorted([name for name, interface in index.items(IBase)])
+      ['derived', 'zope.app.component.interfaceindex.IBase']
+      >>> sorted([name for name, interface in index.items(Interface)])
+      ['derived', 'zope.app.component.interfaceindex.IBase']
+
+    The index is reused as long as the utility registrations don't change,
+    registration events update it in place:
+
+      >>> getInterfaceIndex() is index
+      True
+
+      >>> zope.component.provideHandler(interfaceRegistered)
+      >>> zope.component.provideHandler(interfaceUnregistered)
+      >>> gsm = zope.component.getGlobalSiteManager()
+      >>> gsm.unregisterUtility(IDerived, IInterface, 'derived')
+      True
+      >>> getInterfaceIndex() is index
+      True
+      >>> [name for name, interface in index.items(IBase)]
+      ['zope.app.component.interfaceindex.IBase']
+
+    Changes that don't send events cause the index to be rebuilt:
+
+      >>> gsm.registerUtility(IDerived, IInterface, 'derived', event=False)
+      >>> getInterfaceIndex() is index
+      False
+      >>> getInterfaceIndex().get('derived')
+      <InterfaceClass zope.app.component.interfaceindex.IDerived>
+
+    """
+    if sm is None:
+        sm = zope.component.getGlobalSiteManager()
+    index = getattr(sm, _INDEX, None)
+    # The registry is replaced when the global site manager is cleaned up
+    if (index is None or index.registry is not sm.utilities
+        or index.generation != sm.utilities._generation):
+        index = InterfaceIndex(sm)
+        setattr(sm, _INDEX, index)
+    return index
+
+
+def _update(registration, apply):
+    if not IUtilityRegistration.providedBy(registration):
+        return
+    sm = registration.registry
+    index = getattr(sm, _INDEX, None)
+    if index is None:
+        return
+    current = sm.utilities._generation
+    # See zope.app.component.index: a single change moves the generation by
+    # one or two, anything else means that the index missed a change.
+    if (index.registry is sm.utilities
+        and 0 < current - index.generation <= 2):
+        if registration.provided.isOrExtends(IInterface):
+            apply(index, registration)
+        index.generation = current
+    else:
+        delattr(sm, _INDEX)
+
+
+@zope.component.adapter(IRegistered)
+def interfaceRegistered(event):
+    """Add a newly registered interface to the index of its site manager."""
+    _update(event.object, InterfaceIndex.add)
+
+
+@zope.component.adapter(IUnregistered)
+def interfaceUnregistered(event):
+    """Remove an interface from the index of its site manager."""
+    _update(event.object, InterfaceIndex.remove)
+
+
+def searchInterfaceUtilities(context, search_string=None, base=None):
+    """Return the ``(name, interface)`` pairs of matching interfaces.
+
+    This is `zope.component.interface.searchInterfaceUtilities` using the
+    interface index of the global site manager.
+    """
+    items = getInterfaceIndex().items(base)
+    if search_string:
+        search_string = search_string.lower()
+        items = [(name, interface) for name, interface in items
+                 if getInterfaceAllDocs(interface).find(search_string) >= 0]
+    return list(items)
+
+
+def searchInterface(context, search_string=None, base=None):
+    """Search the registered interfaces.
+
+      >>> from zope.interface import Interface
+      >>> class I5(Interface):
+      ...     pass
+      >>> searchInterface(None, 'zope.app.component.interfaceindex.I5')
+      []
+
+      >>> from zope.component.interface import provideInterface
+      >>> provideInterface('', I5)
+      >>> searchInterface(None, 'zope.app.component.interfaceindex.I5')
+      [<InterfaceClass zope.app.component.interfaceindex.I5>]
+      >>> searchInterface(None, base=Interface)
+      [<InterfaceClass zope.app.component.interfaceindex.I5>]
+      >>> searchInterface(None, base=I5)
+      [<InterfaceClass zope.app.component.interfaceindex.I5>]
+
+    """
+    return [interface for name, interface
+            in searchInterfaceUtilities(context, search_string, base)]
+
+
+def searchInterfaceIds(context, search_string=None, base=None):
+    """Search the registered interfaces and return their names.
+
+      >>> from zope.interface import Interface
+      >>> class I5(Interface):
+      ...     pass
+      >>> from zope.component.interface import provideInterface
+      >>> provideInterface('', I5)
+      >>> searchInterfaceIds(None, 'zope.app.component.interfaceindex.I5')
+      ['zope.app.component.interfaceindex.I5']
+
+    """
+    return [name for name, interface
+            in searchInterfaceUtilities(context, search_string, base)]
+
+
+def interfaceToName(context, interface):
+    """Return the name used for `interface` in vocabularies and forms.
+
+    This gives the same result as `zope.component.interface.interfaceToName`:
+    a registered interface that is equal to `interface` has the same module
+    and name, so the registered interfaces are not searched at all:
+
+      >>> from zope.interface import Interface
+      >>> class I6(Interface):
+      ...     pass
+      >>> interfaceToName(None, I6)
+      'zope.app.component.interfaceindex.I6'
+      >>> interfaceToName(None, None)
+      'None'
+
+    """
+    if interface is None:
+        return 'None'
+    return interface.__module__ + '.' + interface.__name__
@@ -12,12 +12,16 @@
 #
 ##############################################################################
 
+import zope.deferredimport
+
 # BBB
-from zope.site.interfaces import (INewLocalSite,
-                                  NewLocalSite,
-                                  ILocalSiteManager,
-                                  ISiteManagementFolder)
+zope.deferredimport.defineFrom('zope.site.interfaces',
+                               'INewLocalSite',
+                               'NewLocalSite',
+                               'ILocalSiteManager',
+                               'ISiteManagementFolder')
 
 # BBB
-from zope.component.interfaces import (ISite,
-                                       IPossibleSite)
+zope.deferredimport.defineFrom('zope.component.interfaces',
+                               'ISite',
+                               'IPossibleSite')
@@ -11,6 +11,10 @@
 # FOR A PARTICULAR PURPOSE.
 #
 ##############################################################################
+import zope.deferredimport
+
 # BBB
-from zope.component.security import PublicPermission, _checker
-from zope.component.zcml import view, resource, subscriber
+zope.deferredimport.defineFrom('zope.component.security',
+                               'PublicPermission', '_checker')
+zope.deferredimport.defineFrom('zope.component.zcml',
+                               'view', 'resource', 'subscriber')
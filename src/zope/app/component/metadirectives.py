@@ -12,15 +12,19 @@
 #
 ##############################################################################
 
+import zope.deferredimport
+
 # BBB
-from zope.security.metadirectives import (IClassDirective,
-                                          IImplementsSubdirective,
-                                          IRequireSubdirective,
-                                          IAllowSubdirective,
-                                          IFactorySubdirective)
+zope.deferredimport.defineFrom('zope.security.metadirectives',
+                               'IClassDirective',
+                               'IImplementsSubdirective',
+                               'IRequireSubdirective',
+                               'IAllowSubdirective',
+                               'IFactorySubdirective')
 
 # BBB
-from zope.component.zcml import (IBasicViewInformation,
-                                 IBasicResourceInformation,
-                                 IViewDirective,
-                                 IResourceDirective)
+zope.deferredimport.defineFrom('zope.component.zcml',
+                               'IBasicViewInformation',
+                               'IBasicResourceInformation',
+                               'IViewDirective',
+                               'IResourceDirective')
@@ -13,19 +13,217 @@
 ##############################################################################
 """This module here is for backwards compatibility.
 
-The real public API is now zope.site
+The real public API is now zope.site, except for `threadSiteSubscriber`
+and `changeSiteConfigurationAfterMove`, which do less work than the ones
+of zope.site.
 """
+import threading
+import weakref
+
+import zope.component
+import zope.component.hooks
+import zope.deferredimport
+from zope.component.interfaces import ISite
+from zope.interface import ro
+from zope.security.proxy import removeSecurityProxy
+
 # on the side of caution for backwards compatibility we
 # import everything defined
-from zope.component.hooks import setSite
-from zope.site.site import (SiteManagementFolder,
-                            SMFolderFactory,
-                            SiteManagerContainer,
-                            _findNextSiteManager,
-                            _LocalAdapterRegistry,
-                            LocalSiteManager,
-                            threadSiteSubscriber,
-                            clearThreadSiteSubscriber,
-                            clearSite,
-                            SiteManagerAdapter,
-                            changeSiteConfigurationAfterMove) # BBB
+zope.deferredimport.defineFrom('zope.component.hooks', 'setSite')
+zope.deferredimport.defineFrom('zope.site.site',
+                               'SiteManagementFolder',
+                               'SMFolderFactory',
+                               'SiteManagerContainer',
+                               '_findNextSiteManager',
+                               '_LocalAdapterRegistry',
+                               'LocalSiteManager',
+                               'clearThreadSiteSubscriber',
+                               'clearSite',
+                               'SiteManagerAdapter') # BBB
+
+
+def threadSiteSubscriber(ob, event):
+    """A subscriber to BeforeTraverseEvent
+
+    Sets the 'site' thread global if the object traversed is a site.  This
+    can be registered instead of `zope.site.threadSiteSubscriber`:
+
+      >>> from zope.component.registry import Components
+      >>> class Site(object):
+      ...     def __init__(self):
+      ...         self.sm = Components()
+      ...     def getSiteManager(self):
+      ...         return self.sm
+      >>> site = Site()
+
+      >>> threadSiteSubscriber(site, None)
+      >>> zope.component.hooks.getSiteManager() is site.sm
+      True
+
+    Traversing the current site again keeps the site manager and the
+    adapter hook that was looked up for it:
+
+      >>> hook = zope.component.hooks.siteinfo.adapter_hook
+      >>> threadSiteSubscriber(site, None)
+      >>> zope.component.hooks.siteinfo.adapter_hook == hook
+      True
+
+    A site that got another site manager is set again:
+
+      >>> site.sm = Components()
+      >>> threadSiteSubscriber(site, None)
+      >>> zope.component.hooks.getSiteManager() is site.sm
+      True
+      >>> zope.component.hooks.siteinfo.adapter_hook == hook
+      False
+
+      >>> other = Site()
+      >>> threadSiteSubscriber(other, None)
+      >>> zope.component.hooks.getSite() is other
+      True
+      >>> zope.component.hooks.siteinfo.adapter_hook == hook
+      False
+
+      >>> zope.component.hooks.setSite()
+
+    """
+    site = removeSecurityProxy(ob)
+    siteinfo = zope.component.hooks.siteinfo
+    if siteinfo.site is site and siteinfo.sm is site.getSiteManager():
+        return
+    zope.component.hooks.setSite(site)
+
+
+def _nextSiteManager(site):
+    from zope.site.site import _findNextSiteManager
+    next = _findNextSiteManager(site)
+    if next is None:
+        next = zope.component.getGlobalSiteManager()
+    return next
+
+
+def _refreshRegistries(sm):
+    # The bases of a site manager above `sm` changed: recompute the
+    # resolution order of its registries.  Unlike setting the bases, this
+    # doesn't invalidate the registries below, which are refreshed in turn.
+    for registry in (sm.adapters, sm.utilities):
+        registry.ro = ro.ro(registry)
+        registry._generation += 1
+        registry._v_lookup.changed(registry)
+
+
+def _updateSites(ob):
+    """Update the site managers of the sites in and below a moved object.
+
+    Only the bases of the outermost sites are set, and only if their next
+    site manager changed.  The ids of the sites are returned.
+    """
+    from zope.container.interfaces import IReadContainer
+    done = set()
+    # object, whether it is inside a site below the moved object, whether
+    # the bases of a site above it changed
+    stack = [(ob, False, False)]
+    while stack:
+        ob, nested, stale = stack.pop()
+        if ISite.providedBy(ob):
+            done.add(id(ob))
+            sm = ob.getSiteManager()
+            if not nested:
+                next = _nextSiteManager(ob)
+                if sm.__bases__ != (next, ):
+                    sm.__bases__ = (next, )
+                    stale = True
+                nested = True
+            elif stale:
+                _refreshRegistries(sm)
+        if IReadContainer.providedBy(ob):
+            for sub in ob.values():
+                stack.append((sub, nested, stale))
+    return done
+
+
+class _Moves(threading.local):
+    event = None
+    done = ()
+
+_moves = _Moves()
+
+
+def changeSiteConfigurationAfterMove(site, event):
+    """After a site is moved, its site manager links have to be updated.
+
+    The move event is dispatched to every site in the moved object.  The
+    first time, all of them are updated at once: the bases of the outermost
+    sites are set if their next site manager changed, and the registries of
+    the sites inside them are refreshed without invalidating the registries
+    below them again.  This can be registered instead of
+    `zope.site.site.changeSiteConfigurationAfterMove`.
+
+      >>> from zope.location.traversing import LocationPhysicallyLocatable
+      >>> zope.component.provideAdapter(LocationPhysicallyLocatable)
+      >>> from zope.site.folder import Folder, rootFolder
+      >>> from zope.site.site import LocalSiteManager
+      >>> def makeSite(folder):
+      ...     folder.setSiteManager(LocalSiteManager(folder))
+      ...     return folder.getSiteManager()
+
+      >>> root = rootFolder()
+      >>> rootSM = makeSite(root)
+      >>> root['other'] = Folder()
+      >>> otherSM = makeSite(root['other'])
+      >>> root['folder'] = Folder()
+      >>> root['folder']['outer'] = Folder()
+      >>> outerSM = makeSite(root['folder']['outer'])
+      >>> root['folder']['outer']['inner'] = Folder()
+      >>> innerSM = makeSite(root['folder']['outer']['inner'])
+      >>> innerSM.adapters.ro[2] is rootSM.adapters
+      True
+
+    Move the folder into the other site:
+
+      >>> from zope.lifecycleevent import ObjectMovedEvent
+      >>> folder = root['folder']
+      >>> del root['folder']
+      >>> root['other']['folder'] = folder
+      >>> event = ObjectMovedEvent(folder, root, 'folder', root['other'],
+      ...                          'folder')
+      >>> generation = innerSM.adapters._generation
+
+      >>> changeSiteConfigurationAfterMove(folder['outer']['inner'], event)
+      >>> changeSiteConfigurationAfterMove(folder['outer'], event)
+      >>> outerSM.__bases__ == (otherSM, )
+      True
+      >>> innerSM.__bases__ == (outerSM, )
+      True
+      >>> innerSM.adapters.ro[2] is otherSM.adapters
+      True
+      >>> innerSM.adapters._generation > generation
+      True
+
+    Moving it within the same site changes nothing:
+
+      >>> other = root['other']
+      >>> del other['folder']
+      >>> other['renamed'] = folder
+      >>> generation = innerSM.adapters._generation
+      >>> changeSiteConfigurationAfterMove(folder['outer'], ObjectMovedEvent(
+      ...     folder, other, 'folder', other, 'renamed'))
+      >>> innerSM.adapters._generation == generation
+      True
+
+    """
+    if event.newParent is None:
+        return
+    moved = _moves.event
+    if moved is None or moved() is not event:
+        _moves.event = weakref.ref(event)
+        _moves.done = _updateSites(event.object)
+    if id(site) in _moves.done:
+        return
+    # A site the moved object doesn't contain as a container item
+    sm = site.getSiteManager()
+    next = _nextSiteManager(site)
+    if sm.__bases__ != (next, ):
+        sm.__bases__ = (next, )
+    else:
+        _refreshRegistries(sm)
@@ -17,20 +17,100 @@ Also contains common test related classes/functions/objects.
 """
 
 import os
+import random
+import tempfile
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from xml.sax.saxutils import quoteattr
+
+import persistent
 import zope.interface
 import zope.site.folder
 from zope.component.interfaces import IComponentLookup
+from zope.container.contained import Contained
+from zope.interface.interface import InterfaceClass
 from zope.app.component.interfaces import ILocalSiteManager
 from zope.app.testing import setup
 from zope.app.testing.placelesssetup import PlacelessSetup
 
-from zope.app.testing.functional import ZCMLLayer
+from zope.app.testing.functional import FunctionalTestSetup, ZCMLLayer
 from zope.traversing.api import traverse
 
-AppComponentLayer = ZCMLLayer(
+
+class CachedZCMLLayer(ZCMLLayer):
+    """A ZCML layer that loads its configuration through the ZCML cache
+
+    The configuration is parsed the first time the layer is set up only.
+    """
+
+    def setUp(self):
+        # The functional test setup loads a configuration that includes the
+        # one of the layer with the cachedInclude directive
+        fd, path = tempfile.mkstemp('.zcml')
+        try:
+            f = os.fdopen(fd, 'w')
+            try:
+                f.write(_CACHED_INCLUDE % quoteattr(self.config_file))
+            finally:
+                f.close()
+            self.setup = FunctionalTestSetup(
+                path, product_config=self.product_config)
+        finally:
+            os.remove(path)
+
+_CACHED_INCLUDE = """\
+<configure xmlns="http://namespaces.zope.org/zope">
+  <include package="zope.app.component" file="meta.zcml" />
+  <cachedInclude file=%s />
+</configure>
+"""
+
+
+AppComponentLayer = CachedZCMLLayer(
     os.path.join(os.path.split(__file__)[0], 'ftesting.zcml'),
     __name__, 'AppComponentLayer', allow_teardown=True)
 
+# site -> the pickled sample folder tree, with or without a site manager in
+# its root folder, or None if it can't be pickled
+_snapshots = {}
+
+
+def _sampleFolderTree(site):
+    root = setup.buildSampleFolderTree()
+    if site:
+        setup.createSiteManager(root)
+    return root
+
+
+def sampleFolderTree(site=False):
+    """Return a copy of the sample folder tree.
+
+    The tree, with a site manager in the root folder if `site` is true, is
+    built the first time and pickled; later calls unpickle a new copy of
+    it, which is much faster than building the folders and site manager
+    again.  The copies share nothing but the global site manager.
+    """
+    try:
+        data = _snapshots[site]
+    except KeyError:
+        root = _sampleFolderTree(site)
+        try:
+            _snapshots[site] = pickle.dumps(root, 2)
+        except Exception:
+            _snapshots[site] = None
+        return root
+    if data is None:
+        return _sampleFolderTree(site)
+    return pickle.loads(data)
+
+
+def clearSnapshots():
+    """Build the sample folder tree again the next time it is needed."""
+    _snapshots.clear()
+
+
 class Place(object):
 
     def __init__(self, path):
@@ -44,13 +124,20 @@ class Place(object):
             # Use __dict__ directly to avoid infinite recursion
             root = inst.__dict__['rootFolder']
         except KeyError:
-            root = inst.rootFolder = setup.buildSampleFolderTree()
+            if inst.snapshots:
+                root = inst.rootFolder = sampleFolderTree()
+            else:
+                root = inst.rootFolder = setup.buildSampleFolderTree()
 
         return traverse(root, self.path)
 
 
 class PlacefulSetup(PlacelessSetup):
 
+    # Whether the sample folder tree is copied from a snapshot taken the
+    # first time it was built, instead of being built for every test
+    snapshots = False
+
     # Places :)
     rootFolder  = Place(u'')
 
@@ -91,7 +178,10 @@ class PlacefulSetup(PlacelessSetup):
         # clean up folders and placeful site managers and services too?
 
     def buildFolders(self, site=False):
-        self.rootFolder = setup.buildSampleFolderTree()
+        if self.snapshots:
+            self.rootFolder = sampleFolderTree(site)
+        else:
+            self.rootFolder = setup.buildSampleFolderTree()
         if site:
             return self.makeSite()
 
@@ -193,3 +283,91 @@ def testingNextUtility(utility, nextutility, interface, name='',
         lambda iface:
         iface.isOrExtends(IComponentLookup) and nextsitemanager or None
         )
+
+
+def syntheticInterface(i):
+    """Return the `i`-th interface of the synthetic site trees.
+
+    The interfaces are made up on demand and kept in this module, so that
+    the registrations using them can be pickled.
+    """
+    name = 'ISynthetic%d' % i
+    iface = globals().get(name)
+    if iface is None:
+        iface = globals()[name] = InterfaceClass(
+            name, (zope.interface.Interface, ), __module__=__name__)
+    return iface
+
+
+class SyntheticUtility(persistent.Persistent, Contained):
+    """A utility of a synthetic site tree"""
+
+    def __init__(self, number):
+        self.number = number
+
+
+class SyntheticAdapter(object):
+    """An adapter and subscriber of a synthetic site tree"""
+
+    def __init__(self, *objects):
+        self.objects = objects
+
+
+def syntheticHandler(*objects):
+    """A handler of a synthetic site tree"""
+
+
+def buildSiteTree(root, depth=3, fanout=3, sites=None, utilities=0,
+                  adapters=0, subscribers=0, handlers=0, interfaces=10,
+                  seed=0):
+    """Build a tree of folders and sites below `root` for load tests.
+
+    `root` gets `fanout` folders, each of them `fanout` folders and so on,
+    down to `depth` levels including `root`.  `root` and `sites` - 1 other
+    folders, all folders if `sites` is None, are made sites.  Every site
+    gets the given number of utilities, stored in its default site
+    management folder, adapters, subscribers and handlers, registered for
+    interfaces picked from the first `interfaces` synthetic interfaces.
+
+    The folders made sites and the interfaces are picked by a random
+    number generator seeded with `seed`, so the same arguments always
+    build the same tree.  The sites are returned, outermost first.
+    """
+    rng = random.Random(seed)
+    pool = [syntheticInterface(i) for i in range(interfaces)]
+
+    folders = [root]
+    level = [root]
+    for i in range(depth - 1):
+        below = []
+        for folder in level:
+            for j in range(fanout):
+                name = u'folder%d' % j
+                folder[name] = zope.site.folder.Folder()
+                below.append(folder[name])
+        folders.extend(below)
+        level = below
+
+    if sites is None or sites >= len(folders):
+        chosen = folders
+    else:
+        picked = set(rng.sample(range(1, len(folders)), max(sites - 1, 0)))
+        chosen = [root] + [folder for i, folder in enumerate(folders)
+                           if i in picked]
+
+    # The folders are made sites outermost first, so that the site
+    # managers find the ones above them
+    for number, folder in enumerate(chosen):
+        sm = setup.createSiteManager(folder)
+        for i in range(utilities):
+            setup.addUtility(sm, u'utility%d' % i, rng.choice(pool),
+                             SyntheticUtility(number))
+        for i in range(adapters):
+            sm.registerAdapter(SyntheticAdapter, (rng.choice(pool), ),
+                               rng.choice(pool), u'adapter%d' % i)
+        for i in range(subscribers):
+            sm.registerSubscriptionAdapter(
+                SyntheticAdapter, (rng.choice(pool), ), rng.choice(pool))
+        for i in range(handlers):
+            sm.registerHandler(syntheticHandler, (rng.choice(pool), ))
+    return chosen
@@ -0,0 +1,278 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Tests for the local component support
+"""
+import doctest
+import unittest
+import zope.component.testing
+from zope.component.interfaces import ISite
+from zope.publisher.browser import TestRequest
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from zope.app.component.contextsite import CONTEXTVARS_SUPPORT
+from zope.app.component.testing import PlacefulSetup, sampleFolderTree
+from zope.app.component.testing import buildSiteTree
+
+
+class ContextSiteTests(unittest.TestCase):
+    """The current site kept in a context variable"""
+
+    def setUp(self):
+        from zope.component.hooks import setHooks
+        from zope.component.registry import Components
+        zope.component.testing.setUp()
+        setHooks()
+        self.sm = Components('site')
+        sm = self.sm
+        class Site(object):
+            def getSiteManager(self):
+                return sm
+        self.site = Site()
+
+    def tearDown(self):
+        zope.component.testing.tearDown()
+
+    def test_contexts(self):
+        import contextvars
+        from zope.app.component import contextsite
+        contextsite.install()
+        self.assertTrue(zope.component.hooks.siteinfo is contextsite.siteinfo)
+        # The site set in a context is not seen by the contexts copied
+        # from it before, like the ones of other asyncio tasks
+        def process():
+            zope.component.hooks.setSite(self.site)
+            return zope.component.getSiteManager()
+        self.assertTrue(contextvars.copy_context().run(process) is self.sm)
+        self.assertTrue(zope.component.hooks.getSite() is None)
+        contextsite.setSite(self.site)
+        self.assertTrue(zope.component.hooks.getSite() is self.site)
+        self.assertTrue(zope.component.getSiteManager() is self.sm)
+        contextsite.uninstall()
+        self.assertTrue(zope.component.hooks.getSite() is self.site)
+
+
+class SnapshotTests(PlacefulSetup, unittest.TestCase):
+    """The sample folder tree copied from a snapshot"""
+
+    snapshots = True
+
+    def setUp(self):
+        PlacefulSetup.setUp(self, site=True)
+
+    def tearDown(self):
+        PlacefulSetup.tearDown(self)
+
+    def test_site(self):
+        sm = self.rootFolder.getSiteManager()
+        self.assertTrue(zope.component.getSiteManager() is sm)
+        self.assertEqual(sm.__bases__,
+                         (zope.component.getGlobalSiteManager(), ))
+
+    def test_copies(self):
+        copy = sampleFolderTree(site=True)
+        self.assertFalse(copy is self.rootFolder)
+        self.assertFalse(copy['folder1'] is self.folder1)
+        self.assertEqual(sorted(copy['folder1'].keys()),
+                         sorted(self.folder1.keys()))
+        self.assertFalse(
+            copy.getSiteManager() is self.rootFolder.getSiteManager())
+
+
+class SiteTreeTests(PlacefulSetup, unittest.TestCase):
+    """Synthetic site trees"""
+
+    def setUp(self):
+        PlacefulSetup.setUp(self)
+
+    def tearDown(self):
+        PlacefulSetup.tearDown(self)
+
+    def build(self, **kw):
+        # The registrations of the sites of a new tree
+        self.createRootFolder()
+        result = []
+        for site in buildSiteTree(self.rootFolder, **kw):
+            sm = site.getSiteManager()
+            result.append((
+                sorted([(r.provided.__name__, r.name)
+                        for r in sm.registeredUtilities()]),
+                sorted([(r.required[0].__name__, r.provided.__name__, r.name)
+                        for r in sm.registeredAdapters()])))
+        return result
+
+    def test_counts(self):
+        self.createRootFolder()
+        sites = buildSiteTree(self.rootFolder, depth=3, fanout=2, sites=4,
+                              utilities=3, adapters=2, subscribers=1,
+                              handlers=1)
+        self.assertEqual(len(sites), 4)
+        self.assertTrue(sites[0] is self.rootFolder)
+        for site in sites:
+            sm = site.getSiteManager()
+            self.assertEqual(len(list(sm.registeredUtilities())), 3)
+            self.assertEqual(len(list(sm.registeredAdapters())), 2)
+            self.assertEqual(
+                len(list(sm.registeredSubscriptionAdapters())), 1)
+            self.assertEqual(len(list(sm.registeredHandlers())), 1)
+        # Sites inside sites are based on them
+        for site in sites[1:]:
+            self.assertTrue(site.getSiteManager().__bases__[0]
+                            in [s.getSiteManager() for s in sites])
+
+    def test_seed(self):
+        kw = dict(depth=3, fanout=3, sites=5, utilities=5, adapters=5)
+        self.assertEqual(self.build(**kw), self.build(**kw))
+        self.assertNotEqual(self.build(seed=1, **kw), self.build(**kw))
+
+
+class MakeSitesTests(PlacefulSetup, unittest.TestCase):
+    """The view making many sites at once"""
+
+    def setUp(self):
+        PlacefulSetup.setUp(self, folders=True)
+
+    def tearDown(self):
+        PlacefulSetup.tearDown(self)
+
+    def addSiteManagers(self, context=None, method='POST', **form):
+        from zope.app.component.browser import MakeSites
+        if context is None:
+            context = self.rootFolder
+        request = TestRequest(form=form, REQUEST_METHOD=method)
+        report = json.loads(MakeSites(context, request).addSiteManagers())
+        return request.response, report
+
+    def test_ids(self):
+        response, report = self.addSiteManagers(ids='folder1')
+        self.assertEqual(response.getHeader('Content-Type'),
+                         'application/json')
+        self.assertEqual(sorted(report), ['rate', 'seconds', 'sites'])
+        self.assertEqual(report['sites'], 1)
+        self.assertTrue(ISite.providedBy(self.folder1))
+        self.assertFalse(ISite.providedBy(self.folder2))
+        self.assertFalse(ISite.providedBy(self.folder1_1))
+
+    def test_chunk(self):
+        response, report = self.addSiteManagers(ids=['folder1', 'folder2'],
+                                                chunk='1')
+        self.assertEqual(report['sites'], 2)
+        response, report = self.addSiteManagers(
+            self.folder1, ids=['folder1_1', 'folder1_2'], chunk='1')
+        self.assertEqual(report['sites'], 2)
+        self.assertEqual(self.folder1_2.getSiteManager().__bases__,
+                         (self.folder1.getSiteManager(), ))
+        response, report = self.addSiteManagers(ids='folder1')
+        self.assertEqual(report['sites'], 0)
+
+    def test_get(self):
+        response, report = self.addSiteManagers(method='GET', ids='folder1')
+        self.assertEqual(response.getStatus(), 405)
+        self.assertEqual(response.getHeader('Allow'), 'POST')
+        self.assertFalse(ISite.providedBy(self.folder1))
+
+    def test_no_ids(self):
+        response, report = self.addSiteManagers()
+        self.assertEqual(response.getStatus(), 400)
+        self.assertEqual(report, {'error': 'No ids given'})
+        self.assertFalse(ISite.providedBy(self.rootFolder))
+        self.assertFalse(ISite.providedBy(self.folder1))
+
+    def test_unknown_id(self):
+        response, report = self.addSiteManagers(ids=['folder1', 'nothing'])
+        self.assertEqual(response.getStatus(), 400)
+        self.assertEqual(report, {'error': 'No item named nothing'})
+        self.assertFalse(ISite.providedBy(self.folder1))
+
+    def test_bad_chunk(self):
+        for chunk in ('many', '-1'):
+            response, report = self.addSiteManagers(ids='folder1',
+                                                    chunk=chunk)
+            self.assertEqual(response.getStatus(), 400)
+            self.assertEqual(
+                report, {'error': 'The chunk must be a positive number'})
+        self.assertFalse(ISite.providedBy(self.folder1))
+
+
+def test_suite():
+    suite = unittest.TestSuite((
+        doctest.DocTestSuite(
+            'zope.app.component',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.bulk',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.cache',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.contextsite',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.index',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.instrumentation',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.interfaceindex',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.site',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.vocabulary',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.warmup',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.zcmlcache',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.zcmlprofile',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.browser.instrumentation',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        doctest.DocTestSuite(
+            'zope.app.component.browser.registration',
+            setUp=zope.component.testing.setUp,
+            tearDown=zope.component.testing.tearDown),
+        unittest.makeSuite(SnapshotTests),
+        unittest.makeSuite(SiteTreeTests),
+        unittest.makeSuite(MakeSitesTests),
+        ))
+    if CONTEXTVARS_SUPPORT:
+        suite.addTest(unittest.makeSuite(ContextSiteTests))
+    return suite
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
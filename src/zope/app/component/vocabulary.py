@@ -12,10 +12,85 @@
 #
 ##############################################################################
 
+import zope.deferredimport
+
 # BBB
+zope.deferredimport.defineFrom('zope.componentvocabulary.vocabulary',
+                               'UtilityTerm',
+                               'UtilityVocabulary',
+                               'InterfacesVocabulary',
+                               'UtilityNameTerm',
+                               'UtilityNames')
+
+from zope.component.interfaces import IUtilityRegistration
+from zope.interface import classProvides, providedBy
+from zope.schema.interfaces import IVocabularyFactory
+from zope.schema.vocabulary import SimpleVocabulary, SimpleTerm
+from zope.security.proxy import removeSecurityProxy
+
+from zope.app.component.interfaceindex import interfaceToName
+
+
+class ObjectInterfacesVocabulary(SimpleVocabulary):
+    """A vocabulary of all interfaces that its context provides.
+
+    This is the vocabulary of `zope.componentvocabulary`, but the names of
+    the interfaces are found with the interface index:
+
+      >>> from zope.interface import Interface, implements
+      >>> class I1(Interface):
+      ...     pass
+      >>> class I2(Interface):
+      ...     pass
+      >>> class I3(I2):
+      ...     pass
+
+      >>> class Object(object):
+      ...     implements(I3, I1)
+
+      >>> vocab = ObjectInterfacesVocabulary(Object())
+      >>> import pprint
+      >>> pprint.pprint(sorted([term.token for term in vocab]))
+      ['zope.app.component.vocabulary.I1',
+       'zope.app.component.vocabulary.I2',
+       'zope.app.component.vocabulary.I3',
+       'zope.interface.Interface']
+
+    """
+    classProvides(IVocabularyFactory)
+
+    def __init__(self, context):
+        # Remove the security proxy so the values from the vocabulary
+        # are the actual interfaces and not proxies.
+        component = removeSecurityProxy(context)
+        interfaces = providedBy(component).flattened()
+        terms = [SimpleTerm(interface, interfaceToName(context, interface))
+                 for interface in interfaces]
+        super(ObjectInterfacesVocabulary, self).__init__(terms)
+
+
+class UtilityComponentInterfacesVocabulary(ObjectInterfacesVocabulary):
+    """The interfaces provided by the component of a utility registration.
+
+      >>> from zope.interface import Interface, implements
+      >>> class IObject(Interface):
+      ...     pass
+      >>> class Object(object):
+      ...     implements(IObject)
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> sm.registerUtility(Object(), IObject)
+      >>> [registration] = sm.registeredUtilities()
+      >>> vocab = UtilityComponentInterfacesVocabulary(registration)
+      >>> sorted([term.token for term in vocab])
+      ['zope.app.component.vocabulary.IObject', 'zope.interface.Interface']
 
-from zope.componentvocabulary.vocabulary import (
-    UtilityTerm, UtilityVocabulary, InterfacesVocabulary,
-    UtilityComponentInterfacesVocabulary, UtilityNameTerm,
-    UtilityNames)
+    """
+    classProvides(IVocabularyFactory)
 
+    def __init__(self, context):
+        if IUtilityRegistration.providedBy(context):
+            context = context.component
+        super(UtilityComponentInterfacesVocabulary, self).__init__(
+            context)
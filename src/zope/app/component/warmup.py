@@ -0,0 +1,290 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Warming up the local site managers of a database
+
+After a restart, the first request to every site has to load the site
+manager and its registries from the database and fill their empty lookup
+caches.  `WarmUp` does this ahead of time in background threads.  Every
+thread opens its own database connection and loads the registries of all
+sites; the connections are then returned to the connection pool of the
+database with their object caches filled, so that requests using them find
+the registries loaded.  Only the first thread looks for the sites, going
+through the containers of the database, the others load the sites it found
+by their object ids.
+
+To warm up the sites when the application starts, register `databaseOpened`
+as a subscriber for ``IDatabaseOpenedWithRootEvent`` of
+``zope.app.appsetup``.  It uses the interfaces, number of threads and paths
+of the containers to look for sites in set in `interfaces`, `workers` and
+`paths`.
+"""
+__docformat__ = 'restructuredtext'
+
+import logging
+import threading
+
+from zope.component.interfaces import IPossibleSite, ISite
+from zope.container.interfaces import IReadContainer
+
+logger = logging.getLogger('zope.app.component.warmup')
+
+# The interfaces whose utility lookups are prepared, the number of threads
+# and the paths of the containers the sites are looked for in, used by
+# `databaseOpened`
+interfaces = []
+workers = 1
+paths = ['']
+
+
+def _activate(obj):
+    activate = getattr(obj, '_p_activate', None)
+    if activate is not None:
+        activate()
+
+
+def sites(root):
+    """Return all sites in or below the container `root`.
+
+      >>> from zope.interface import implements
+      >>> class Folder(dict):
+      ...     implements(IReadContainer, IPossibleSite)
+      >>> class Site(Folder):
+      ...     implements(ISite)
+
+      >>> root = Site()
+      >>> root['folder'] = Folder(site=Site(), other=object())
+      >>> len(list(sites(root)))
+      2
+
+    Only objects whose class makes them containers or possible sites are
+    looked at, so the content objects of a database are not loaded.
+    """
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        # The class of a ghost is known without loading it
+        cls = obj.__class__
+        if IPossibleSite.implementedBy(cls) and ISite.providedBy(obj):
+            yield obj
+        if IReadContainer.implementedBy(cls):
+            stack.extend(obj.values())
+
+
+def _traverse(root, path):
+    obj = root
+    for name in path.split('/'):
+        if name:
+            obj = obj[name]
+    return obj
+
+
+def warmSite(site, interfaces=()):
+    """Load the site manager of `site` and prepare lookups of `interfaces`.
+
+    The site manager, its registries and the registries of its bases are
+    loaded.  For every interface, the utilities provided by it are looked
+    up, which fills the lookup caches of the utility registries:
+
+      >>> from zope.interface import Interface, implements
+      >>> class IObject(Interface):
+      ...     pass
+
+      >>> from zope.component.registry import Components
+      >>> sm = Components()
+      >>> sm.registerUtility(42, IObject, u'answer')
+      >>> class Site(object):
+      ...     implements(ISite)
+      ...     def getSiteManager(self):
+      ...         return sm
+
+      >>> warmSite(Site(), [IObject])
+      1
+
+    The number of utilities found is returned.
+    """
+    sm = site.getSiteManager()
+    _activate(sm)
+    for name in ('_utility_registrations', '_adapter_registrations',
+                 '_subscription_registrations', '_handler_registrations'):
+        _activate(getattr(sm, name, None))
+    for registries in (sm.utilities, sm.adapters):
+        for registry in registries.ro:
+            _activate(registry)
+
+    found = 0
+    for interface in interfaces:
+        for name, utility in sm.getUtilitiesFor(interface):
+            sm.utilities.lookup((), interface, name)
+            found += 1
+        sm.getAllUtilitiesRegisteredFor(interface)
+    return found
+
+
+class WarmUp(object):
+    """Warm up the sites of a database in background threads
+
+    `workers` threads are started, each with its own connection, and every
+    thread warms up all sites in the containers at `paths`, relative to the
+    root folder.  While they run, `sites` is the number of sites warmed up
+    so far, added up over the threads, and `errors` the number of sites
+    that could not be warmed up.  `progress`, if given, is called with
+    every site after it was warmed up.
+
+      >>> import transaction
+      >>> from ZODB.DB import DB
+      >>> from ZODB.DemoStorage import DemoStorage
+      >>> from zope.site.folder import Folder, rootFolder
+      >>> from zope.site.site import LocalSiteManager
+
+      >>> db = DB(DemoStorage())
+      >>> connection = db.open()
+      >>> root = rootFolder()
+      >>> root.setSiteManager(LocalSiteManager(root))
+      >>> root['folder'] = Folder()
+      >>> site = root['folder']['site'] = Folder()
+      >>> site.setSiteManager(LocalSiteManager(site))
+      >>> connection.root()['Application'] = root
+      >>> transaction.commit()
+      >>> connection.close()
+
+      >>> warmup = warmUp(db, workers=2)
+      >>> warmup.join()
+      >>> warmup.finished()
+      True
+      >>> warmup.sites, warmup.errors
+      (4, 0)
+
+    The sites can be looked for in some containers only:
+
+      >>> warmup = warmUp(db, paths=['folder'])
+      >>> warmup.join()
+      >>> warmup.sites
+      1
+
+      >>> db.close()
+
+    """
+
+    root_name = 'Application'
+
+    def __init__(self, db, interfaces=(), workers=1, progress=None,
+                 paths=('', )):
+        self.db = db
+        self.interfaces = list(interfaces)
+        self.workers = max(1, workers)
+        self.progress = progress
+        self.paths = list(paths)
+        self.sites = self.errors = 0
+        self._lock = threading.Lock()
+        self._threads = []
+        # The object ids of the sites found by the first thread
+        self._oids = []
+        self._found = threading.Event()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.run, args=(i == 0, ),
+                                      name='warm-up-%d' % i)
+            thread.daemon = True
+            self._threads.append(thread)
+            thread.start()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def finished(self):
+        return not [thread for thread in self._threads if thread.is_alive()]
+
+    def _count(self, site, error):
+        self._lock.acquire()
+        try:
+            if error:
+                self.errors += 1
+            else:
+                self.sites += 1
+        finally:
+            self._lock.release()
+        if self.progress is not None and not error:
+            self.progress(site)
+
+    def _warm(self, site):
+        try:
+            warmSite(site, self.interfaces)
+        except Exception:
+            logger.exception("Could not warm up %r", site)
+            self._count(site, True)
+        else:
+            self._count(site, False)
+
+    def _find(self, connection):
+        # Look for the sites in the containers, telling the other threads
+        # about them
+        found = []
+        try:
+            root = connection.root().get(self.root_name)
+            if root is None:
+                return found
+            for path in self.paths:
+                try:
+                    container = _traverse(root, path)
+                except (KeyError, TypeError):
+                    logger.warning("No container at %r to warm up", path)
+                    continue
+                for site in sites(container):
+                    found.append(site)
+                    oid = getattr(site, '_p_oid', None)
+                    if oid is not None:
+                        self._oids.append(oid)
+        finally:
+            self._found.set()
+        return found
+
+    def run(self, first=True):
+        import transaction
+        manager = transaction.TransactionManager()
+        connection = self.db.open(transaction_manager=manager)
+        try:
+            if first:
+                for site in self._find(connection):
+                    self._warm(site)
+            else:
+                self._found.wait()
+                for oid in self._oids:
+                    try:
+                        site = connection.get(oid)
+                    except Exception:
+                        logger.exception("Could not load the site %r", oid)
+                        self._count(None, True)
+                    else:
+                        self._warm(site)
+            logger.info("Warmed up %d sites", self.sites)
+        finally:
+            manager.abort()
+            connection.close()
+
+
+def warmUp(db, interfaces=(), workers=1, progress=None, paths=('', )):
+    """Start warming up the sites of the database `db`.
+
+    The `WarmUp` that was started is returned.
+    """
+    warmup = WarmUp(db, interfaces, workers, progress, paths)
+    warmup.start()
+    return warmup
+
+
+def databaseOpened(event):
+    """Warm up the sites of a newly opened database."""
+    warmUp(event.database, interfaces, workers, paths=paths)
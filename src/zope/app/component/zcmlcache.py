@@ -0,0 +1,307 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Cached ZCML configuration
+
+Loading a ZCML file parses the whole tree of included files and resolves
+all dotted names in it, only to produce a list of configuration actions.
+`load` keeps that list, with the conflicts between the actions resolved,
+after the first time and executes it again the next time the same file is
+loaded, as long as none of the included files was changed and the same
+versions of all distributions are installed.
+
+The action lists are kept in memory, which helps test layers that are set
+up again and again.  If a cache directory is given, they are also pickled
+there for the next process.  The actions of a configuration that refers to
+objects that can't be pickled, like the view classes that ``browser:page``
+makes up, are only cached in memory.
+
+Directive handlers that change things while the ZCML is parsed, instead of
+through actions, are not run again when the actions are replayed.
+"""
+__docformat__ = 'restructuredtext'
+
+import hashlib
+import logging
+import os
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import zope.configuration.fields
+import zope.interface
+from zope.configuration import config as configuration
+from zope.configuration import xmlconfig
+
+logger = logging.getLogger('zope.app.component.zcmlcache')
+
+# The directory the action lists are pickled to by `config`
+directory = None
+
+# (file name, features) -> (files and their modification times, versions,
+# features provided, actions)
+_cache = {}
+
+
+def _mtimes(files):
+    mtimes = []
+    for path in sorted(files):
+        try:
+            mtimes.append((path, os.stat(path).st_mtime))
+        except OSError:
+            mtimes.append((path, None))
+    return tuple(mtimes)
+
+
+def _versions():
+    import pkg_resources
+    return tuple(sorted([(dist.project_name, dist.version)
+                         for dist in pkg_resources.working_set]))
+
+
+def _current(entry):
+    mtimes, versions = entry[:2]
+    return (_mtimes([path for path, mtime in mtimes]) == mtimes
+            and _versions() == versions)
+
+
+def _path(cachedir, key):
+    return os.path.join(
+        cachedir, hashlib.sha1(repr(key)).hexdigest() + '.pickle')
+
+
+def _read(cachedir, key):
+    path = _path(cachedir, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        f = open(path, 'rb')
+        try:
+            return pickle.load(f)
+        finally:
+            f.close()
+    except Exception:
+        logger.warning("Could not read the cached configuration %s", path,
+                       exc_info=True)
+        return None
+
+
+def _write(cachedir, key, entry):
+    path = _path(cachedir, key)
+    try:
+        data = pickle.dumps(entry, 2)
+    except Exception as e:
+        logger.info("The configuration of %s can't be stored on disk: %s",
+                    key[0], e)
+        return
+    f = open(path + '.tmp', 'wb')
+    try:
+        f.write(data)
+    finally:
+        f.close()
+    os.rename(path + '.tmp', path)
+
+
+def load(file, features=(), cachedir=None):
+    """Execute the ZCML file `file` and return the configuration context.
+
+    Let's write a configuration file:
+
+      >>> import tempfile
+      >>> tmp = tempfile.mkdtemp()
+      >>> fn = os.path.join(tmp, 'configure.zcml')
+      >>> def write(*handlers):
+      ...     f = open(fn, 'w')
+      ...     f.write('<configure xmlns="http://namespaces.zope.org/zope">')
+      ...     f.write('<include package="zope.component" file="meta.zcml" />')
+      ...     for handler in handlers:
+      ...         f.write('<subscriber handler="%s" />' % handler)
+      ...     f.write('</configure>')
+      ...     f.close()
+      >>> write('zope.app.component.instrumentation.requestEnded')
+
+      >>> import zope.component
+      >>> def handlers():
+      ...     sm = zope.component.getGlobalSiteManager()
+      ...     return len(list(sm.registeredHandlers()))
+
+    We also count how often a file is parsed:
+
+      >>> parsed = []
+      >>> original = xmlconfig.file
+      >>> def file(*args, **kw):
+      ...     parsed.append(args[0])
+      ...     return original(*args, **kw)
+      >>> xmlconfig.file = file
+
+      >>> context = load(fn, cachedir=tmp)
+      >>> handlers(), len(parsed)
+      (1, 1)
+
+    The next time, the actions are executed again without reading the file:
+
+      >>> from zope.testing.cleanup import cleanUp
+      >>> cleanUp()
+      >>> context = load(fn, cachedir=tmp)
+      >>> handlers(), len(parsed)
+      (1, 1)
+
+    The actions were also stored in the cache directory:
+
+      >>> _cache.clear()
+      >>> cleanUp()
+      >>> context = load(fn, cachedir=tmp)
+      >>> handlers(), len(parsed)
+      (1, 1)
+
+    Once the file was changed, it is read again:
+
+      >>> cleanUp()
+      >>> write('zope.app.component.instrumentation.requestEnded',
+      ...       'zope.app.component.index.registrationAdded')
+      >>> stat = os.stat(fn)
+      >>> os.utime(fn, (stat.st_atime, stat.st_mtime + 10))
+      >>> context = load(fn, cachedir=tmp)
+      >>> handlers(), len(parsed)
+      (2, 2)
+
+      >>> xmlconfig.file = original
+      >>> import shutil
+      >>> shutil.rmtree(tmp)
+      >>> _cache.clear()
+
+    """
+    entry = _entry(file, features, cachedir)
+    context = configuration.ConfigurationMachine()
+    context._features.update(entry[2])
+    context.actions = list(entry[3])
+    context.execute_actions()
+    return context
+
+
+def _entry(file, features, cachedir):
+    # The cache entry of `file`, which is parsed if there is none or the
+    # one there is out of date
+    file = os.path.abspath(file)
+    key = file, tuple(features)
+    entry = _cache.get(key)
+    if entry is None and cachedir is not None:
+        entry = _read(cachedir, key)
+    if entry is None or not _current(entry):
+        context = configuration.ConfigurationMachine()
+        xmlconfig.registerCommonDirectives(context)
+        for feature in features:
+            context.provideFeature(feature)
+        context = xmlconfig.file(file, context=context, execute=False)
+        actions = configuration.resolveConflicts(context.actions)
+        entry = (_mtimes(context._seen_files | set([file])), _versions(),
+                 tuple(context._features), tuple(actions))
+        if cachedir is not None:
+            _write(cachedir, key, entry)
+    _cache[key] = entry
+    return entry
+
+
+class ICachedIncludeDirective(zope.interface.Interface):
+    """Include the cached actions of a configuration file"""
+
+    file = zope.configuration.fields.Path(
+        title=u"Configuration file",
+        required=True)
+
+
+def cachedInclude(_context, file):
+    """Include the actions of the ZCML file `file`, cached like with `load`.
+
+    The actions are cached in memory and in the `directory` set in this
+    module.  They are added to the actions of the including configuration,
+    which executes them:
+
+      >>> import tempfile
+      >>> tmp = tempfile.mkdtemp()
+      >>> fn = os.path.join(tmp, 'configure.zcml')
+      >>> f = open(fn, 'w')
+      >>> f.write('<configure xmlns="http://namespaces.zope.org/zope">'
+      ...         '<include package="zope.component" file="meta.zcml" />'
+      ...         '<subscriber handler='
+      ...         '"zope.app.component.instrumentation.requestEnded" />'
+      ...         '</configure>')
+      >>> f.close()
+
+      >>> import zope.component
+      >>> def handlers():
+      ...     sm = zope.component.getGlobalSiteManager()
+      ...     return len(list(sm.registeredHandlers()))
+      >>> zcml = '''
+      ... <configure xmlns="http://namespaces.zope.org/zope">
+      ...   <include package="zope.app.component" file="meta.zcml" />
+      ...   <cachedInclude file="%s" />
+      ... </configure>
+      ... ''' % fn
+
+      >>> context = xmlconfig.string(zcml)
+      >>> handlers()
+      1
+
+    The second time, the file isn't parsed:
+
+      >>> from zope.testing.cleanup import cleanUp
+      >>> cleanUp()
+      >>> parsed = []
+      >>> original = xmlconfig.file
+      >>> def file(*args, **kw):
+      ...     parsed.append(args[0])
+      ...     return original(*args, **kw)
+      >>> xmlconfig.file = file
+      >>> context = xmlconfig.string(zcml)
+      >>> handlers(), parsed
+      (1, [])
+
+      >>> xmlconfig.file = original
+      >>> import shutil
+      >>> shutil.rmtree(tmp)
+      >>> _cache.clear()
+
+    """
+    entry = _entry(file, (), directory)
+    for feature in entry[2]:
+        _context.provideFeature(feature)
+    _context.actions.extend(entry[3])
+
+
+def config(file, features=(), cachedir=None):
+    """Set up the application configuration like `zope.app.appsetup.config`.
+
+    The configuration is loaded with `load`, from the `cachedir` given or
+    the `directory` set in this module.  `zope.app.appsetup.config` then
+    finds the application configured already and does nothing.
+    """
+    import zope.component.hooks
+    from zope.app.appsetup import appsetup
+    from zope.security.management import newInteraction, endInteraction
+
+    if appsetup._configured:
+        return appsetup.getConfigContext()
+    if cachedir is None:
+        cachedir = directory
+
+    newInteraction(appsetup.SystemConfigurationParticipation())
+    zope.component.hooks.setHooks()
+    context = load(file, features, cachedir)
+    endInteraction()
+
+    appsetup._configured = True
+    setattr(appsetup, '__config_source', file)
+    setattr(appsetup, '__config_context', context)
+    return context
@@ -0,0 +1,258 @@
+##############################################################################
+#
+# Copyright (c) 2011 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Where the time goes when a ZCML configuration is loaded
+
+`profile` loads a configuration file and measures every directive: the
+time spent processing it, without the directives inside it, and the time
+spent executing the actions it created.  The numbers are added up per kind
+of directive and per file the directives are in.  Run it with::
+
+  python -m zope.app.component.zcmlprofile site.zcml
+
+to get a report of the directives and files, the most expensive first.
+Allocations are counted as the net number of memory blocks allocated, on
+Pythons that count them.
+"""
+__docformat__ = 'restructuredtext'
+
+import optparse
+import sys
+import timeit
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from zope.configuration import config as configuration
+from zope.configuration import xmlconfig
+
+_timer = timeit.default_timer
+_blocks = getattr(sys, 'getallocatedblocks', None)
+
+
+def _allocated():
+    if _blocks is None:
+        return 0
+    return _blocks()
+
+
+def _label(name):
+    # (namespace, name) -> prefix:name, the prefix being the last part of
+    # the namespace.  Labels are native strings, whatever the parser gave.
+    if isinstance(name, tuple):
+        namespace, name = name
+        prefix = (namespace or '').rstrip('/').split('/')[-1]
+        if prefix:
+            return str('%s:%s' % (prefix, name))
+    return str(name)
+
+
+class Profile(object):
+    """Times and allocations of the directives of a configuration
+
+    `directives` and `files` map the directives and files to a list of the
+    number of directives, the seconds and the allocations.
+    """
+
+    def __init__(self):
+        self.directives = {}
+        self.files = {}
+
+    def add(self, directive, file, seconds, allocations, count=1):
+        for table, key in ((self.directives, directive), (self.files, file)):
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = [0, 0.0, 0]
+            entry[0] += count
+            entry[1] += seconds
+            entry[2] += allocations
+
+    def report(self):
+        """Return the numbers, the most expensive directives and files first.
+
+          >>> profile = Profile()
+          >>> profile.add('zope:adapter', 'configure.zcml', 0.5, 10)
+          >>> profile.add('browser:page', 'configure.zcml', 1.0, 20)
+          >>> profile.add('browser:page', 'browser.zcml', 1.0, 5)
+          >>> report = profile.report()
+          >>> row = report['directives'][0]
+          >>> row['name'], row['count'], row['seconds'], row['allocations']
+          ('browser:page', 2, 2.0, 25)
+          >>> [entry['name'] for entry in report['files']]
+          ['configure.zcml', 'browser.zcml']
+
+        """
+        def rows(table):
+            result = [{'name': name, 'count': count, 'seconds': seconds,
+                       'allocations': allocations}
+                      for name, (count, seconds, allocations)
+                      in table.items()]
+            result.sort(key=lambda row: (-row['seconds'], row['name']))
+            return result
+        return {'directives': rows(self.directives),
+                'files': rows(self.files)}
+
+    def format(self, limit=None):
+        """Return the report as text."""
+        report = self.report()
+        lines = []
+        for title, rows in (('Directive', report['directives']),
+                            ('File', report['files'])):
+            lines.append('%-60s %7s %10s %12s'
+                         % (title, 'Count', 'Seconds', 'Allocations'))
+            for row in rows[:limit]:
+                name = row['name']
+                if len(name) > 60:
+                    name = '...' + name[-57:]
+                lines.append('%-60s %7d %10.4f %12d' % (
+                    name, row['count'], row['seconds'], row['allocations']))
+            lines.append('')
+        return '\n'.join(lines)
+
+
+class ProfilingConfigurationMachine(configuration.ConfigurationMachine):
+    """A configuration machine that profiles the directives it processes
+    """
+
+    def __init__(self):
+        self.profile = Profile()
+        # The directives being processed: name, info, start time, allocated
+        # blocks at the start, time and blocks of the directives inside
+        self._directives = []
+        # info -> name of the directive, to attribute the actions
+        self._names = {}
+        super(ProfilingConfigurationMachine, self).__init__()
+
+    def begin(self, name, data=None, info=None, **kw):
+        self._names[info] = _label(name)
+        self._directives.append([name, info, _timer(), _allocated(), 0.0, 0])
+        super(ProfilingConfigurationMachine, self).begin(
+            name, data, info, **kw)
+
+    def end(self):
+        try:
+            super(ProfilingConfigurationMachine, self).end()
+        finally:
+            name, info, start, allocated, inner, innerAllocated = (
+                self._directives.pop())
+            seconds = _timer() - start
+            allocations = _allocated() - allocated
+            if self._directives:
+                outer = self._directives[-1]
+                outer[4] += seconds
+                outer[5] += allocations
+            self.profile.add(_label(name), getattr(info, 'file', None),
+                             seconds - inner, allocations - innerAllocated)
+
+    def _timed(self, action):
+        if not isinstance(action, dict):
+            # zope.configuration before 3.8 keeps actions as tuples
+            action = configuration.expand_action(*action)
+        if isinstance(action, dict):
+            action = dict(action)
+            action['callable'] = self._wrap(action['callable'],
+                                            action['info'])
+            return action
+        action = list(action)
+        action[1] = self._wrap(action[1], action[5])
+        return tuple(action)
+
+    def _wrap(self, callable, info):
+        if callable is None:
+            return None
+        name = self._names.get(info, 'action')
+        file = getattr(info, 'file', None)
+        profile = self.profile
+        def timed(*args, **kw):
+            start = _timer()
+            allocated = _allocated()
+            try:
+                return callable(*args, **kw)
+            finally:
+                profile.add(name, file, _timer() - start,
+                            _allocated() - allocated, 0)
+        return timed
+
+    def execute_actions(self, clear=True, testing=False):
+        self.actions[:] = [self._timed(action) for action in self.actions]
+        super(ProfilingConfigurationMachine, self).execute_actions(
+            clear, testing)
+
+
+def profile(file, features=()):
+    """Load the ZCML file `file` and return the profile.
+
+      >>> import os, tempfile
+      >>> fd, fn = tempfile.mkstemp('.zcml')
+      >>> written = os.write(fd,
+      ...     '<configure xmlns="http://namespaces.zope.org/zope">'
+      ...     '<include package="zope.component" file="meta.zcml" />'
+      ...     '<subscriber'
+      ...     ' handler="zope.app.component.instrumentation.requestEnded" />'
+      ...     '</configure>')
+      >>> os.close(fd)
+
+      >>> report = profile(fn).report()
+      >>> sorted([(row['name'], row['count']) for row in report['directives']
+      ...         if row['name'] in ('zope:subscriber', 'zope:include')])
+      [('zope:include', 1), ('zope:subscriber', 1)]
+      >>> fn in [row['name'] for row in report['files']]
+      True
+
+      >>> os.remove(fn)
+
+    The configuration is executed, unlike the cached configuration of
+    `zope.app.component.zcmlcache`.
+    """
+    context = ProfilingConfigurationMachine()
+    xmlconfig.registerCommonDirectives(context)
+    for feature in features:
+        context.provideFeature(feature)
+    xmlconfig.file(file, context=context)
+    return context.profile
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage="%prog [options] file.zcml")
+    parser.add_option('--limit', type='int', default=None,
+                      help="number of directives and files to report")
+    parser.add_option('--json', action='store_true', default=False,
+                      help="write the report as JSON")
+    parser.add_option('--output', default=None,
+                      help="file to write the report to")
+    options, args = parser.parse_args(argv)
+    if len(args) != 1:
+        parser.error("A ZCML file has to be given")
+
+    result = profile(args[0])
+    if options.json:
+        report = result.report()
+        if options.limit is not None:
+            for rows in report.values():
+                del rows[options.limit:]
+        text = json.dumps(report, indent=2, sort_keys=True) + '\n'
+    else:
+        text = result.format(options.limit)
+    if options.output:
+        f = open(options.output, 'w')
+        try:
+            f.write(text)
+        finally:
+            f.close()
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == '__main__':
+    main()